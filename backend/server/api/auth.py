@@ -3,7 +3,6 @@ from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.responses import RedirectResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-import httpx
 
 from server import crud
 from server.schemas.users import UserCreate, UserResponse
@@ -16,6 +15,7 @@ from server.utils.auth import (
 )
 from server.utils.database import get_db
 from server.utils.config import settings
+from server.utils.http_clients import http_clients
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
@@ -109,27 +109,27 @@ async def google_login():
 @router.get("/google/callback")
 async def google_callback(code: str, db: Session = Depends(get_db)):
     try:
-        async with httpx.AsyncClient() as client:
-            token_response = await client.post(
-                "https://oauth2.googleapis.com/token",
-                data={
-                    "code": code,
-                    "client_id": settings.GOOGLE_CLIENT_ID,
-                    "client_secret": settings.GOOGLE_CLIENT_SECRET,
-                    "redirect_uri": settings.GOOGLE_REDIRECT_URI,
-                    "grant_type": "authorization_code",
-                },
-            )
-            token_data = token_response.json()
-            
-            if "error" in token_data:
-                raise HTTPException(status_code=400, detail=token_data["error"])
-            
-            user_info_response = await client.get(
-                "https://www.googleapis.com/oauth2/v2/userinfo",
-                headers={"Authorization": f"Bearer {token_data['access_token']}"},
-            )
-            user_info = user_info_response.json()
+        client = http_clients.get("google")
+        token_response = await client.post(
+            "https://oauth2.googleapis.com/token",
+            data={
+                "code": code,
+                "client_id": settings.GOOGLE_CLIENT_ID,
+                "client_secret": settings.GOOGLE_CLIENT_SECRET,
+                "redirect_uri": settings.GOOGLE_REDIRECT_URI,
+                "grant_type": "authorization_code",
+            },
+        )
+        token_data = token_response.json()
+        
+        if "error" in token_data:
+            raise HTTPException(status_code=400, detail=token_data["error"])
+        
+        user_info_response = await client.get(
+            "https://www.googleapis.com/oauth2/v2/userinfo",
+            headers={"Authorization": f"Bearer {token_data['access_token']}"},
+        )
+        user_info = user_info_response.json()
         
         email = user_info.get("email")
         google_id = user_info.get("id")
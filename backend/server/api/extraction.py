@@ -1,22 +1,90 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from typing import Optional
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.orm import Session
+import asyncio
+from datetime import date
+from typing import List, Optional
+
+from server import crud
 
 from server.schemas.extraction import (
     DocumentType,
     UploadResponse,
+    BulkUploadResponse,
     JobStatusResponse,
+    JobStatusQuery,
+    JobStatusBatchResponse,
+    FieldQuery,
+    FieldReextractRequest,
+    RetypeRequest,
+    FieldQueryResponse,
+    SearchResponse,
+    ExtractionLimits,
     ExtractionResult,
     JobStatus
 )
+from server.utils.auth import get_current_admin, get_current_user
+from server.utils.config import settings
+from server.utils.database import get_db
 from server.utils.extraction_service import extraction_service
+from server.utils.http_cache import (
+    is_not_modified,
+    json_response,
+    make_etag,
+    not_modified_response,
+    parse_projection
+)
+from server.utils.http_clients import http_clients
+from server.utils.profiling import profiler
+from server.utils.result_export import EXPORT_FORMATS, EXPORTERS
+from server.utils.scheduling import resolve_limits
+from server.utils.usage import BudgetExceeded
 
 router = APIRouter(prefix="/extraction", tags=["extraction"])
 
 
+def check_limits(current_user, db: Session, cost: int = 1):
+    """Enforce the caller's daily model budget (in reject mode) and rate limit."""
+    limits = resolve_limits(current_user.meta)
+    if (
+        settings.USAGE_BUDGET_ACTION == "reject"
+        and extraction_service.usage.over_budget(current_user.user_id, limits["daily_budget_usd"], db)
+    ):
+        raise HTTPException(status_code=402, detail="Daily extraction budget exhausted")
+    # A full bucket holds `burst` tokens, so a larger request could never be admitted
+    if cost > limits["burst"]:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {int(limits['burst'])} PDFs can be submitted at once",
+        )
+    retry_after = extraction_service.rate_limiter.acquire(current_user.user_id, limits, cost)
+    if retry_after > 0:
+        raise HTTPException(
+            status_code=429,
+            detail="Extraction rate limit exceeded",
+            headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+        )
+    return limits
+
+
+def get_owned_job_status(job_id: str, current_user):
+    status = extraction_service.get_job_status(job_id)
+    
+    if not status or not extraction_service.is_owner(job_id, current_user.user_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return status
+
+
 @router.post("/upload", response_model=UploadResponse)
 async def upload_pdf(
     file: UploadFile = File(...),
-    document_type: str = Form(default=DocumentType.AUTO)
+    document_type: str = Form(default=DocumentType.AUTO),
+    previous_job_id: Optional[str] = Form(
+        default=None, description="Earlier version of this document; only changed pages are extracted"
+    ),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user)
 ):
     if not file.filename.endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
@@ -29,7 +97,20 @@ async def upload_pdf(
     if len(pdf_bytes) > 10 * 1024 * 1024:
         raise HTTPException(status_code=400, detail="File size must be less than 10MB")
     
-    job_id = extraction_service.create_job(pdf_bytes, document_type)
+    if previous_job_id:
+        previous = get_owned_job_status(previous_job_id, current_user)
+        if previous["status"] != JobStatus.COMPLETED:
+            raise HTTPException(status_code=409, detail="Previous version has not completed")
+    
+    limits = check_limits(current_user, db)
+    job_id = extraction_service.create_job(
+        pdf_bytes,
+        document_type,
+        user_id=current_user.user_id,
+        weight=limits["weight"],
+        previous_job_id=previous_job_id,
+        daily_budget_usd=limits["daily_budget_usd"]
+    )
     
     return UploadResponse(
         job_id=job_id,
@@ -38,27 +119,346 @@ async def upload_pdf(
     )
 
 
+@router.post("/bulk", response_model=BulkUploadResponse)
+async def upload_pdfs_bulk(
+    files: List[UploadFile] = File(...),
+    document_type: str = Form(default=DocumentType.AUTO),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user)
+):
+    if document_type not in [dt.value for dt in DocumentType]:
+        raise HTTPException(status_code=400, detail="Invalid document type")
+    
+    documents = []
+    for file in files:
+        if not file.filename.endswith('.pdf'):
+            raise HTTPException(status_code=400, detail=f"Only PDF files are allowed: {file.filename}")
+        
+        pdf_bytes = await file.read()
+        
+        if len(pdf_bytes) > 10 * 1024 * 1024:
+            raise HTTPException(status_code=400, detail=f"File size must be less than 10MB: {file.filename}")
+        
+        documents.append(pdf_bytes)
+    
+    limits = check_limits(current_user, db, cost=len(documents))
+    job_ids = [
+        extraction_service.create_job(
+            pdf_bytes,
+            document_type,
+            bulk=True,
+            user_id=current_user.user_id,
+            daily_budget_usd=limits["daily_budget_usd"]
+        )
+        for pdf_bytes in documents
+    ]
+    
+    return BulkUploadResponse(
+        job_ids=job_ids,
+        status=JobStatus.PENDING,
+        message=f"{len(job_ids)} PDFs queued for bulk extraction."
+    )
+
+
+@router.post("/status", response_model=JobStatusBatchResponse)
+async def get_job_statuses(
+    query: JobStatusQuery,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user)
+):
+    job_ids = [
+        job_id for job_id in dict.fromkeys(query.job_ids)
+        if extraction_service.is_owner(job_id, current_user.user_id)
+    ]
+    # Don't hold a pooled connection for the length of the long poll
+    db.close()
+    changed = []
+    
+    if query.wait > 0 or query.known_versions:
+        timeout = min(query.wait, settings.STATUS_LONG_POLL_MAX_SECONDS)
+        changed = await extraction_service.wait_for_changes(
+            job_ids, query.known_versions, timeout
+        )
+    
+    statuses = []
+    missing = []
+    for job_id in dict.fromkeys(query.job_ids):
+        status = extraction_service.get_job_status(job_id) if job_id in job_ids else None
+        if status:
+            statuses.append(JobStatusResponse(**status))
+        else:
+            missing.append(job_id)
+    
+    return JobStatusBatchResponse(statuses=statuses, changed=changed, missing=missing)
+
+
 @router.get("/status/{job_id}", response_model=JobStatusResponse)
-async def get_job_status(job_id: str):
-    status = extraction_service.get_job_status(job_id)
+async def get_job_status(job_id: str, request: Request, current_user=Depends(get_current_user)):
+    status = get_owned_job_status(job_id, current_user)
     
-    if not status:
-        raise HTTPException(status_code=404, detail="Job not found")
+    # Queue position moves without a version bump, so it is part of the tag
+    etag = make_etag("status", job_id, status["version"], status["queue_position"])
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
     
-    return JobStatusResponse(**status)
+    return json_response(request, JobStatusResponse(**status).model_dump(mode="json"), etag)
+
+
+@router.post("/cancel/{job_id}", response_model=JobStatusResponse)
+async def cancel_job(job_id: str, current_user=Depends(get_current_user)):
+    get_owned_job_status(job_id, current_user)
+    
+    if not extraction_service.cancel_job(job_id):
+        raise HTTPException(status_code=409, detail="Job has already finished")
+    
+    return JobStatusResponse(**extraction_service.get_job_status(job_id))
 
 
 @router.get("/result/{job_id}", response_model=ExtractionResult)
-async def get_extraction_result(job_id: str):
-    result = extraction_service.get_job_result(job_id)
+async def get_extraction_result(
+    job_id: str,
+    request: Request,
+    include: Optional[str] = Query(
+        default=None,
+        description="Comma-separated response keys to return, e.g. 'job_id,status,fields' to skip raw_data"
+    ),
+    current_user=Depends(get_current_user)
+):
+    status = get_owned_job_status(job_id, current_user)
+    
+    projection = parse_projection(include)
+    etag = make_etag("result", job_id, status["version"], ",".join(sorted(projection or [])))
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    
+    result = await asyncio.to_thread(extraction_service.get_job_result, job_id)
     
     if not result:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    return ExtractionResult(**result)
+    payload = ExtractionResult(**result).model_dump(mode="json", include=projection)
+    return json_response(request, payload, etag)
+
+
+@router.post("/result/{job_id}/reextract", response_model=ExtractionResult)
+async def reextract_fields(
+    job_id: str,
+    body: FieldReextractRequest,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user)
+):
+    get_owned_job_status(job_id, current_user)
+    check_limits(current_user, db)
+    # Re-extraction opens its own sessions; holding this one could exhaust the pool
+    db.close()
+    
+    try:
+        await extraction_service.reextract_fields(job_id, body.keys)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except BudgetExceeded as e:
+        raise HTTPException(status_code=402, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Re-extraction failed: {str(e)}")
+    
+    return ExtractionResult(**await asyncio.to_thread(extraction_service.get_job_result, job_id))
+
+
+@router.post("/result/{job_id}/retype", response_model=UploadResponse)
+async def retype_job(
+    job_id: str,
+    body: RetypeRequest,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user)
+):
+    get_owned_job_status(job_id, current_user)
+    limits = check_limits(current_user, db)
+    
+    try:
+        new_job_id = extraction_service.create_retyped_job(
+            job_id,
+            body.document_type.value,
+            weight=limits["weight"],
+            daily_budget_usd=limits["daily_budget_usd"]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    return UploadResponse(
+        job_id=new_job_id,
+        status=JobStatus.PENDING,
+        message=f"Re-extracting as {body.document_type.value} from the already parsed pages."
+    )
 
 
 @router.get("/history")
-async def get_extraction_history():
-    history = extraction_service.get_all_completed_jobs()
+async def get_extraction_history(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    document_type: Optional[str] = None,
+    current_user=Depends(get_current_user)
+):
+    history = await asyncio.to_thread(
+        extraction_service.get_all_completed_jobs, current_user.user_id, start, end, document_type
+    )
     return {"history": history}
+
+
+@router.get("/export")
+async def export_results(
+    format: str = Query(default="ndjson", description="ndjson, csv or parquet"),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    document_type: Optional[str] = None,
+    current_user=Depends(get_current_user)
+):
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format: {format}")
+    
+    job_ids = extraction_service.completed_job_ids(current_user.user_id, start, end, document_type)
+    results = lambda: extraction_service.iter_job_results(job_ids)
+    
+    return StreamingResponse(
+        EXPORTERS[format](results),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="extractions.{format}"'},
+    )
+
+
+@router.post("/query", response_model=FieldQueryResponse)
+async def query_extracted_fields(
+    query: FieldQuery,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user)
+):
+    try:
+        return crud.extracted_field.query(db, query, user_id=current_user.user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/search", response_model=SearchResponse)
+async def search_documents(
+    q: str = Query(..., min_length=1),
+    document_type: Optional[str] = None,
+    limit: int = Query(default=20, ge=1, le=100),
+    offset: int = Query(default=0, ge=0),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user)
+):
+    return crud.document_page.search(
+        db, q, document_type, limit, offset, user_id=current_user.user_id
+    )
+
+
+@router.get("/similarity")
+async def get_similarity_stats(admin=Depends(get_current_admin)):
+    return extraction_service.similarity.stats()
+
+
+@router.get("/templates")
+async def get_template_stats(admin=Depends(get_current_admin)):
+    return extraction_service.templates.stats()
+
+
+@router.get("/memory")
+async def get_job_memory_usage(admin=Depends(get_current_admin)):
+    return extraction_service.retention.memory_usage()
+
+
+@router.get("/artifacts")
+async def get_parse_artifact_stats(admin=Depends(get_current_admin)):
+    return extraction_service.parse_artifacts.stats()
+
+
+@router.get("/scanned-pages")
+async def get_scanned_page_stats(admin=Depends(get_current_admin)):
+    return extraction_service.page_images.stats()
+
+
+@router.get("/http-clients")
+async def get_http_client_stats(admin=Depends(get_current_admin)):
+    return http_clients.stats()
+
+
+@router.get("/scheduler")
+async def get_scheduler_stats(admin=Depends(get_current_admin)):
+    return extraction_service.scheduler.stats()
+
+
+@router.get("/latency")
+async def get_model_latency_stats(admin=Depends(get_current_admin)):
+    return extraction_service.latency.stats()
+
+
+@router.get("/cascade")
+async def get_cascade_stats(admin=Depends(get_current_admin)):
+    return extraction_service.cascade.stats()
+
+
+@router.get("/profiles")
+async def list_profiles(admin=Depends(get_current_admin)):
+    return {"profiles": profiler.list()}
+
+
+def get_stored_profile(profile_id: str):
+    profile = profiler.get(profile_id)
+    
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    
+    return profile
+
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str, admin=Depends(get_current_admin)):
+    profile = get_stored_profile(profile_id)
+    return {**profile.summary(), "spans": profile.span_tree()}
+
+
+@router.get("/profiles/{profile_id}/speedscope")
+async def download_profile(profile_id: str, admin=Depends(get_current_admin)):
+    profile = get_stored_profile(profile_id)
+    return JSONResponse(
+        profile.to_speedscope(),
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.speedscope.json"'},
+    )
+
+
+@router.get("/usage")
+async def get_model_usage(
+    group_by: str = Query(
+        default="user,model,day",
+        description="Comma-separated: job, user, model, day, document_type, purpose"
+    ),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    user_id: Optional[int] = None,
+    limit: int = Query(default=1000, ge=1, le=10000),
+    db: Session = Depends(get_db),
+    admin=Depends(get_current_admin)
+):
+    groups = [name.strip() for name in group_by.split(",") if name.strip()]
+    try:
+        rows = crud.model_usage.summary(db, groups, start, end, user_id, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"group_by": groups, "rows": rows}
+
+
+@router.get("/limits", response_model=ExtractionLimits)
+async def get_my_extraction_limits(current_user=Depends(get_current_user)):
+    return ExtractionLimits(**resolve_limits(current_user.meta))
+
+
+@router.put("/admin/users/{user_id}/limits", response_model=ExtractionLimits)
+async def set_user_extraction_limits(
+    user_id: int,
+    limits: ExtractionLimits,
+    db: Session = Depends(get_db),
+    admin=Depends(get_current_admin)
+):
+    user = crud.user.update_extraction_limits(db, user_id, limits.model_dump(exclude_none=True))
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return ExtractionLimits(**resolve_limits(user.meta))
@@ -1,3 +1,7 @@
 from server.crud.users import user
+from server.crud.extracted_fields import extracted_field
+from server.crud.document_pages import document_page
+from server.crud.parse_artifacts import parse_artifact
+from server.crud.model_usage import model_usage
 
-__all__ = ["user"]
+__all__ = ["user", "extracted_field", "document_page", "parse_artifact", "model_usage"]
@@ -0,0 +1,141 @@
+import re
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from server.models.extraction import DocumentPageRecord
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def _fts5_query(query: str) -> str:
+    """Quote every term so user input cannot inject FTS5 syntax; terms are ANDed."""
+    return " ".join(f'"{token}"' for token in _TOKEN.findall(query))
+
+
+class DocumentPageCRUD:
+    def index_job(
+        self,
+        db: Session,
+        job_id: str,
+        document_type: Optional[str],
+        pages: List[str],
+        user_id: Optional[int] = None,
+    ) -> int:
+        """Replace the stored page text of a job"""
+        db.query(DocumentPageRecord).filter(DocumentPageRecord.job_id == job_id).delete()
+        records = [
+            DocumentPageRecord(
+                job_id=job_id,
+                user_id=user_id,
+                document_type=document_type,
+                page_number=page_number,
+                content=content,
+            )
+            for page_number, content in enumerate(pages, start=1)
+            if content and content.strip()
+        ]
+        db.add_all(records)
+        db.commit()
+        return len(records)
+
+    def get_pages(
+        self, db: Session, job_id: str, page_numbers: Optional[List[int]] = None
+    ) -> Dict[int, str]:
+        """Stored page text of a job by 1-indexed page number"""
+        query = db.query(DocumentPageRecord).filter(DocumentPageRecord.job_id == job_id)
+        if page_numbers:
+            query = query.filter(DocumentPageRecord.page_number.in_(page_numbers))
+        return {
+            record.page_number: record.content
+            for record in query.order_by(DocumentPageRecord.page_number)
+        }
+
+    def search(
+        self,
+        db: Session,
+        query: str,
+        document_type: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0,
+        user_id: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Ranked page-level full-text search with highlighted snippets"""
+        if db.get_bind().dialect.name == "postgresql":
+            return self._search_postgres(db, query, document_type, limit, offset, user_id)
+        return self._search_sqlite(db, query, document_type, limit, offset, user_id)
+
+    def _search_sqlite(self, db, query, document_type, limit, offset, user_id) -> Dict[str, Any]:
+        match = _fts5_query(query)
+        if not match:
+            return {"total": 0, "results": []}
+
+        scope_filter = "AND p.user_id IS :user_id"
+        if document_type:
+            scope_filter += " AND p.document_type = :document_type"
+        params = {
+            "match": match,
+            "user_id": user_id,
+            "document_type": document_type,
+            "limit": limit,
+            "offset": offset,
+        }
+
+        total = db.execute(text(f"""
+            SELECT count(*) FROM document_pages_fts
+            JOIN document_pages p ON p.id = document_pages_fts.rowid
+            WHERE document_pages_fts MATCH :match {scope_filter}
+        """), params).scalar()
+
+        rows = db.execute(text(f"""
+            SELECT p.job_id, p.document_type, p.page_number AS page,
+                   snippet(document_pages_fts, 0, '<mark>', '</mark>', '…', 16) AS snippet,
+                   -bm25(document_pages_fts) AS rank
+            FROM document_pages_fts
+            JOIN document_pages p ON p.id = document_pages_fts.rowid
+            WHERE document_pages_fts MATCH :match {scope_filter}
+            ORDER BY bm25(document_pages_fts)
+            LIMIT :limit OFFSET :offset
+        """), params).mappings().all()
+
+        return {"total": total or 0, "results": [dict(row) for row in rows]}
+
+    def _search_postgres(self, db, query, document_type, limit, offset, user_id) -> Dict[str, Any]:
+        scope_filter = "AND p.user_id IS NOT DISTINCT FROM :user_id"
+        if document_type:
+            scope_filter += " AND p.document_type = :document_type"
+        params = {
+            "query": query,
+            "user_id": user_id,
+            "document_type": document_type,
+            "limit": limit,
+            "offset": offset,
+        }
+
+        total = db.execute(text(f"""
+            SELECT count(*) FROM document_pages p
+            WHERE p.search_vector @@ websearch_to_tsquery('english', :query) {scope_filter}
+        """), params).scalar()
+
+        # Rank and page first, so ts_headline only runs on the returned rows
+        rows = db.execute(text(f"""
+            WITH ranked AS (
+                SELECT p.id, ts_rank_cd(p.search_vector, q.query) AS rank, q.query
+                FROM document_pages p, websearch_to_tsquery('english', :query) AS q(query)
+                WHERE p.search_vector @@ q.query {scope_filter}
+                ORDER BY rank DESC, p.id
+                LIMIT :limit OFFSET :offset
+            )
+            SELECT p.job_id, p.document_type, p.page_number AS page,
+                   ts_headline('english', p.content, ranked.query,
+                               'StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=24') AS snippet,
+                   ranked.rank
+            FROM ranked JOIN document_pages p ON p.id = ranked.id
+            ORDER BY ranked.rank DESC, p.id
+        """), params).mappings().all()
+
+        return {"total": total or 0, "results": [dict(row) for row in rows]}
+
+
+document_page = DocumentPageCRUD()
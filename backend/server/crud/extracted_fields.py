@@ -0,0 +1,207 @@
+import re
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import Session, aliased
+
+from server.models.extraction import ExtractedFieldRecord
+from server.schemas.extraction import FieldFilter, FieldQuery, FieldValueType
+from server.utils.field_values import to_date, to_number, to_text
+
+_ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}")
+
+_AGGREGATES = {
+    "count": func.count,
+    "sum": func.sum,
+    "avg": func.avg,
+    "min": func.min,
+    "max": func.max,
+}
+
+
+def _column(record, value_type: FieldValueType):
+    if value_type == FieldValueType.NUMBER:
+        return record.number_value
+    if value_type == FieldValueType.DATE:
+        return record.date_value
+    return record.text_value
+
+
+def _infer_value_type(value: Any) -> FieldValueType:
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return FieldValueType.NUMBER
+    if isinstance(value, str) and _ISO_DATE.match(value) and to_date(value):
+        return FieldValueType.DATE
+    return FieldValueType.TEXT
+
+
+def _coerce(value: Any, value_type: FieldValueType):
+    if value_type == FieldValueType.NUMBER:
+        coerced = to_number(value)
+    elif value_type == FieldValueType.DATE:
+        coerced = to_date(value)
+    else:
+        coerced = to_text(value)
+    if coerced is None:
+        raise ValueError(f"Cannot interpret {value!r} as {value_type.value}")
+    return coerced
+
+
+def _condition(record, field_filter: FieldFilter):
+    value_type = field_filter.value_type or _infer_value_type(field_filter.value)
+    column = _column(record, value_type)
+    op = field_filter.op
+
+    if op == "in":
+        values = field_filter.value if isinstance(field_filter.value, list) else [field_filter.value]
+        return column.in_([_coerce(v, value_type) for v in values])
+    if op == "contains":
+        if value_type != FieldValueType.TEXT:
+            raise ValueError("'contains' is only supported for text values")
+        return column.ilike(f"%{_coerce(field_filter.value, value_type)}%")
+
+    value = _coerce(field_filter.value, value_type)
+    return {
+        "eq": column == value,
+        "ne": column != value,
+        "gt": column > value,
+        "gte": column >= value,
+        "lt": column < value,
+        "lte": column <= value,
+    }[op]
+
+
+def _record_value(record: ExtractedFieldRecord):
+    if record.field_type == "number" and record.number_value is not None:
+        return record.number_value
+    if record.field_type == "date" and record.date_value is not None:
+        return record.date_value.isoformat()
+    return record.text_value
+
+
+class ExtractedFieldCRUD:
+    def index_job(
+        self,
+        db: Session,
+        job_id: str,
+        document_type: Optional[str],
+        fields: List[Dict[str, Any]],
+        user_id: Optional[int] = None,
+    ) -> int:
+        """Replace the indexed fields of a job with typed rows"""
+        db.query(ExtractedFieldRecord).filter(ExtractedFieldRecord.job_id == job_id).delete()
+
+        records = []
+        for field in fields:
+            if not isinstance(field, dict) or not field.get("key"):
+                continue
+            value = field.get("value")
+            field_type = field.get("field_type") or "text"
+            location = field.get("location") or {}
+            records.append(ExtractedFieldRecord(
+                job_id=job_id,
+                user_id=user_id,
+                document_type=document_type,
+                key=field["key"],
+                label=field.get("label"),
+                field_type=field_type,
+                text_value=to_text(value),
+                number_value=to_number(value) if field_type == "number" else None,
+                date_value=to_date(value) if field_type == "date" else None,
+                confidence=to_number(field.get("confidence")),
+                page=location.get("page") if isinstance(location, dict) else None,
+            ))
+
+        db.add_all(records)
+        db.commit()
+        return len(records)
+
+    def query(self, db: Session, query: FieldQuery, user_id: Optional[int] = None) -> Dict[str, Any]:
+        """Filter, sort, page and aggregate documents by their extracted fields"""
+        record = ExtractedFieldRecord
+        matched = select(
+            record.job_id,
+            func.max(record.document_type).label("document_type"),
+            func.max(record.created_at).label("indexed_at"),
+        ).where(record.user_id == user_id).group_by(record.job_id)
+
+        if query.document_type:
+            matched = matched.where(record.document_type == query.document_type)
+        for field_filter in query.filters:
+            candidate = aliased(ExtractedFieldRecord)
+            matched = matched.where(record.job_id.in_(
+                select(candidate.job_id).where(
+                    candidate.key == field_filter.key, _condition(candidate, field_filter)
+                )
+            ))
+        matched = matched.subquery()
+
+        total = db.scalar(select(func.count()).select_from(matched)) or 0
+
+        page = select(matched.c.job_id, matched.c.document_type)
+        if query.sort:
+            sort_record = aliased(ExtractedFieldRecord)
+            sort_value = func.max(_column(sort_record, query.sort.value_type)).label("sort_value")
+            page = (
+                page.add_columns(sort_value)
+                .outerjoin(sort_record, and_(
+                    sort_record.job_id == matched.c.job_id, sort_record.key == query.sort.key
+                ))
+                .group_by(matched.c.job_id, matched.c.document_type)
+            )
+            ordering = sort_value.desc() if query.sort.direction == "desc" else sort_value.asc()
+            page = page.order_by(ordering.nulls_last(), matched.c.job_id)
+        else:
+            page = page.order_by(matched.c.indexed_at.desc(), matched.c.job_id)
+        page_rows = db.execute(page.limit(query.limit).offset(query.offset)).all()
+
+        results = {
+            row.job_id: {"job_id": row.job_id, "document_type": row.document_type, "fields": {}}
+            for row in page_rows
+        }
+        if results:
+            for field in db.query(ExtractedFieldRecord).filter(
+                ExtractedFieldRecord.job_id.in_(list(results))
+            ):
+                results[field.job_id]["fields"].setdefault(field.key, _record_value(field))
+
+        return {
+            "total": total,
+            "results": list(results.values()),
+            "aggregates": [
+                row for aggregate in query.aggregates
+                for row in self._aggregate(db, matched, aggregate.key, aggregate.func, query.group_by)
+            ],
+        }
+
+    def _aggregate(
+        self, db: Session, matched, key: str, func_name: str, group_by: Optional[str]
+    ) -> List[Dict[str, Any]]:
+        value_record = aliased(ExtractedFieldRecord)
+        column = value_record.id if func_name == "count" else value_record.number_value
+        value = _AGGREGATES[func_name](column).label("value")
+        in_matched = value_record.job_id.in_(select(matched.c.job_id))
+
+        if group_by is None:
+            stmt = select(value).where(value_record.key == key, in_matched)
+            return [{"key": key, "func": func_name, "value": db.scalar(stmt)}]
+
+        if group_by == "document_type":
+            group = value_record.document_type.label("group")
+            stmt = select(group, value).where(value_record.key == key, in_matched)
+        else:
+            group_record = aliased(ExtractedFieldRecord)
+            group = group_record.text_value.label("group")
+            stmt = select(group, value).join(group_record, and_(
+                group_record.job_id == value_record.job_id, group_record.key == group_by
+            )).where(value_record.key == key, in_matched)
+
+        return [
+            {"key": key, "func": func_name, "group": row.group, "value": row.value}
+            for row in db.execute(stmt.group_by(group).order_by(group))
+        ]
+
+
+extracted_field = ExtractedFieldCRUD()
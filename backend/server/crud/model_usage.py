@@ -0,0 +1,77 @@
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from server.models.extraction import ModelUsageRecord
+
+GROUP_COLUMNS = {
+    "job": ModelUsageRecord.job_id,
+    "user": ModelUsageRecord.user_id,
+    "model": ModelUsageRecord.model,
+    "day": func.date(ModelUsageRecord.created_at),
+    "document_type": ModelUsageRecord.document_type,
+    "purpose": ModelUsageRecord.purpose,
+}
+
+
+class ModelUsageCRUD:
+    def record(self, db: Session, **values) -> ModelUsageRecord:
+        record = ModelUsageRecord(**values)
+        db.add(record)
+        db.commit()
+        return record
+
+    def spent_since(self, db: Session, user_id: Optional[int], since: datetime) -> float:
+        return db.scalar(
+            select(func.coalesce(func.sum(ModelUsageRecord.cost_usd), 0.0)).where(
+                ModelUsageRecord.user_id == user_id, ModelUsageRecord.created_at >= since
+            )
+        ) or 0.0
+
+    def summary(
+        self,
+        db: Session,
+        group_by: List[str],
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        user_id: Optional[int] = None,
+        limit: int = 1000,
+    ) -> List[Dict[str, Any]]:
+        """Calls, tokens, cost and latency grouped by any of GROUP_COLUMNS"""
+        unknown = [name for name in group_by if name not in GROUP_COLUMNS]
+        if unknown:
+            raise ValueError(
+                f"Unknown group_by {', '.join(unknown)}; expected any of {', '.join(GROUP_COLUMNS)}"
+            )
+
+        groups = [GROUP_COLUMNS[name].label(name) for name in group_by]
+        cost = func.sum(ModelUsageRecord.cost_usd).label("cost_usd")
+        stmt = select(
+            *groups,
+            func.count().label("calls"),
+            func.sum(ModelUsageRecord.input_tokens).label("input_tokens"),
+            func.sum(ModelUsageRecord.output_tokens).label("output_tokens"),
+            cost,
+            func.avg(ModelUsageRecord.latency_ms).label("avg_latency_ms"),
+        )
+        if start:
+            stmt = stmt.where(ModelUsageRecord.created_at >= datetime.combine(start, datetime.min.time()))
+        if end:
+            stmt = stmt.where(
+                ModelUsageRecord.created_at < datetime.combine(end + timedelta(days=1), datetime.min.time())
+            )
+        if user_id is not None:
+            stmt = stmt.where(ModelUsageRecord.user_id == user_id)
+        if groups:
+            stmt = stmt.group_by(*groups)
+
+        rows = db.execute(stmt.order_by(cost.desc()).limit(limit)).mappings()
+        return [
+            {**row, "day": str(row["day"])} if "day" in row else dict(row)
+            for row in rows
+        ]
+
+
+model_usage = ModelUsageCRUD()
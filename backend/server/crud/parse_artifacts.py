@@ -0,0 +1,31 @@
+import json
+from typing import List, Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from server.models.extraction import ParseArtifactRecord
+
+
+class ParseArtifactCRUD:
+    def get(self, db: Session, content_hash: str) -> Optional[List[str]]:
+        record = db.get(ParseArtifactRecord, content_hash)
+        return json.loads(record.pages) if record else None
+
+    def save(self, db: Session, content_hash: str, pages: List[str]):
+        """Store the parsed pages of a PDF unless they are already stored"""
+        if db.get(ParseArtifactRecord, content_hash) is not None:
+            return
+        db.add(ParseArtifactRecord(
+            content_hash=content_hash,
+            page_count=len(pages),
+            pages=json.dumps(pages),
+        ))
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another job with the same content stored it first
+            db.rollback()
+
+
+parse_artifact = ParseArtifactCRUD()
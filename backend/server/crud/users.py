@@ -122,5 +122,18 @@ class UserCRUD:
             return None
         return user.profile_image
 
+    def update_extraction_limits(self, db: Session, user_id: int, limits: dict) -> Optional[User]:
+        """Store per-account extraction limits in user meta"""
+        user = self.get(db, user_id)
+        if not user:
+            return None
+        
+        meta = dict(user.meta or {})
+        meta["extraction_limits"] = {**meta.get("extraction_limits", {}), **limits}
+        user.meta = meta
+        db.commit()
+        db.refresh(user)
+        return user
+
 
 user = UserCRUD()
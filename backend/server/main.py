@@ -1,12 +1,22 @@
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from sqlalchemy import text
 
 from server.api import auth, extraction
+from server.utils.auth import decode_access_token, is_admin_email
 from server.utils.database import init_database, close_db_connection, SessionLocal
+from server.utils.extraction_service import extraction_service
+from server.utils.http_clients import http_clients
+from server.utils.profiling import profiler
 from server.models.users import User
+from server.models.extraction import (
+    DocumentPageRecord,
+    ExtractedFieldRecord,
+    ModelUsageRecord,
+    ParseArtifactRecord,
+)
 
 ALLOWED_HOSTS = [
     "localhost",
@@ -34,8 +44,13 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"WARNING: Database initialization error: {e}. Continuing startup...")
 
+    http_clients.start()
+    extraction_service.use_http_client(http_clients.get("anthropic"))
+
     yield
 
+    await http_clients.close()
+
     print("\033[93mINFO:     Shutting down: Closing database connections")
     try:
         close_db_connection()
@@ -62,9 +77,35 @@ app.add_middleware(
         "Content-Type",
         "X-Requested-With",
         "x-vercel-set-bypass-cookie",
+        "X-Profile",
     ],
+    expose_headers=["X-Profile-Id"],
 )
 
+
+def profile_requested(request: Request) -> bool:
+    """Whether an admin asked for this request to be profiled via the X-Profile header."""
+    if request.headers.get("X-Profile", "").lower() not in ("1", "true", "yes"):
+        return False
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    try:
+        return is_admin_email(decode_access_token(token).get("email", ""))
+    except HTTPException:
+        return False
+
+
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    if not (profile_requested(request) or profiler.sampled()):
+        return await call_next(request)
+
+    with profiler.profile("request", f"{request.method} {request.url.path}") as profile:
+        response = await call_next(request)
+    response.headers["X-Profile-Id"] = profile.id
+    return response
+
 app.include_router(auth.router)
 app.include_router(extraction.router)
 
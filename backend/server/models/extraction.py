@@ -0,0 +1,137 @@
+import datetime
+
+from sqlalchemy import (
+    DDL,
+    TIMESTAMP,
+    Column,
+    Date,
+    Float,
+    Index,
+    Integer,
+    String,
+    Text,
+    event,
+)
+
+from server.utils.database import Base
+
+
+class ExtractedFieldRecord(Base):
+    __tablename__ = "extracted_fields"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job_id = Column(String(36), nullable=False, index=True)
+    user_id = Column(Integer, nullable=True, index=True)
+    document_type = Column(String, nullable=True)
+    key = Column(String, nullable=False)
+    label = Column(String, nullable=True)
+    field_type = Column(String, nullable=False, default="text")
+    text_value = Column(String(1024), nullable=True)
+    number_value = Column(Float, nullable=True)
+    date_value = Column(Date, nullable=True)
+    confidence = Column(Float, nullable=True)
+    page = Column(Integer, nullable=True)
+
+    created_at = Column(
+        TIMESTAMP,
+        default=datetime.datetime.utcnow,
+        nullable=False,
+    )
+
+    __table_args__ = (
+        Index("ix_extracted_fields_key_number", "key", "number_value", "job_id"),
+        Index("ix_extracted_fields_key_date", "key", "date_value", "job_id"),
+        Index("ix_extracted_fields_key_text", "key", "text_value", "job_id"),
+        Index("ix_extracted_fields_type_key", "document_type", "key", "job_id"),
+    )
+
+
+class DocumentPageRecord(Base):
+    __tablename__ = "document_pages"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job_id = Column(String(36), nullable=False, index=True)
+    user_id = Column(Integer, nullable=True, index=True)
+    document_type = Column(String, nullable=True, index=True)
+    page_number = Column(Integer, nullable=False)
+    content = Column(Text, nullable=False, default="")
+
+    created_at = Column(
+        TIMESTAMP,
+        default=datetime.datetime.utcnow,
+        nullable=False,
+    )
+
+
+class ParseArtifactRecord(Base):
+    """Parsed page text of a PDF, keyed by the SHA-256 of its bytes"""
+
+    __tablename__ = "parse_artifacts"
+
+    content_hash = Column(String(64), primary_key=True)
+    page_count = Column(Integer, nullable=False)
+    pages = Column(Text, nullable=False)  # JSON list of page text
+
+    created_at = Column(
+        TIMESTAMP,
+        default=datetime.datetime.utcnow,
+        nullable=False,
+    )
+
+
+class ModelUsageRecord(Base):
+    """Token usage and estimated cost of one model call"""
+
+    __tablename__ = "model_usage"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job_id = Column(String(36), nullable=True, index=True)
+    user_id = Column(Integer, nullable=True)
+    document_type = Column(String, nullable=True)
+    model = Column(String, nullable=False)
+    purpose = Column(String, nullable=False)
+    input_tokens = Column(Integer, nullable=False, default=0)
+    output_tokens = Column(Integer, nullable=False, default=0)
+    cost_usd = Column(Float, nullable=False, default=0.0)
+    latency_ms = Column(Integer, nullable=True)
+
+    created_at = Column(
+        TIMESTAMP,
+        default=datetime.datetime.utcnow,
+        nullable=False,
+    )
+
+    __table_args__ = (
+        Index("ix_model_usage_user_created", "user_id", "created_at"),
+        Index("ix_model_usage_created", "created_at"),
+    )
+
+
+# Full-text indexes are dialect specific: an external-content FTS5 table kept in
+# sync by triggers on SQLite, and a generated tsvector column with a GIN index on
+# Postgres.
+_SQLITE_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS document_pages_fts USING fts5("
+    "content, content='document_pages', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS document_pages_fts_ai AFTER INSERT ON document_pages BEGIN "
+    "INSERT INTO document_pages_fts(rowid, content) VALUES (new.id, new.content); END",
+    "CREATE TRIGGER IF NOT EXISTS document_pages_fts_ad AFTER DELETE ON document_pages BEGIN "
+    "INSERT INTO document_pages_fts(document_pages_fts, rowid, content) "
+    "VALUES ('delete', old.id, old.content); END",
+]
+
+_POSTGRES_FTS_DDL = [
+    "ALTER TABLE document_pages ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('english', coalesce(content, ''))) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_document_pages_search_vector "
+    "ON document_pages USING GIN (search_vector)",
+]
+
+for statement in _SQLITE_FTS_DDL:
+    event.listen(
+        DocumentPageRecord.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite")
+    )
+for statement in _POSTGRES_FTS_DDL:
+    event.listen(
+        DocumentPageRecord.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql")
+    )
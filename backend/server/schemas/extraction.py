@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Dict, Any, Optional, List
+from pydantic import BaseModel, Field
+from typing import Dict, Any, Literal, Optional, List
 from enum import Enum
 
 
@@ -15,6 +15,7 @@ class JobStatus(str, Enum):
     PROCESSING = "processing"
     COMPLETED = "completed"
     FAILED = "failed"
+    CANCELLED = "cancelled"
 
 
 class UploadResponse(BaseModel):
@@ -23,6 +24,12 @@ class UploadResponse(BaseModel):
     message: str
 
 
+class BulkUploadResponse(BaseModel):
+    job_ids: List[str]
+    status: JobStatus
+    message: str
+
+
 class BoundingBox(BaseModel):
     page: int
     region: str
@@ -43,9 +50,27 @@ class JobStatusResponse(BaseModel):
     status: JobStatus
     document_type: Optional[str] = None
     progress: Optional[int] = None
+    version: Optional[int] = None
+    similar_jobs: Optional[List[Dict[str, Any]]] = None
+    queue_position: Optional[int] = None
     error: Optional[str] = None
 
 
+class JobStatusQuery(BaseModel):
+    job_ids: List[str] = Field(..., min_length=1, max_length=500)
+    wait: float = Field(default=0, ge=0, description="Long-poll for up to this many seconds")
+    known_versions: Dict[str, int] = Field(
+        default_factory=dict,
+        description="Last version seen per job; a differing version counts as a change"
+    )
+
+
+class JobStatusBatchResponse(BaseModel):
+    statuses: List[JobStatusResponse]
+    changed: List[str]
+    missing: List[str]
+
+
 class ExtractionResult(BaseModel):
     job_id: str
     status: JobStatus
@@ -54,3 +79,76 @@ class ExtractionResult(BaseModel):
     raw_data: Dict[str, Any]
     created_at: str
     error: Optional[str] = None
+
+
+class FieldReextractRequest(BaseModel):
+    keys: List[str] = Field(..., min_length=1, max_length=50, description="Field keys to extract again")
+
+
+class RetypeRequest(BaseModel):
+    document_type: DocumentType
+
+
+class FieldValueType(str, Enum):
+    TEXT = "text"
+    NUMBER = "number"
+    DATE = "date"
+
+
+class FieldFilter(BaseModel):
+    key: str
+    op: Literal["eq", "ne", "gt", "gte", "lt", "lte", "in", "contains"] = "eq"
+    value: Any
+    value_type: Optional[FieldValueType] = None
+
+
+class FieldSort(BaseModel):
+    key: str
+    value_type: FieldValueType = FieldValueType.NUMBER
+    direction: Literal["asc", "desc"] = "desc"
+
+
+class FieldAggregate(BaseModel):
+    key: str
+    func: Literal["count", "sum", "avg", "min", "max"] = "sum"
+
+
+class FieldQuery(BaseModel):
+    document_type: Optional[str] = None
+    filters: List[FieldFilter] = Field(default_factory=list)
+    sort: Optional[FieldSort] = None
+    aggregates: List[FieldAggregate] = Field(default_factory=list)
+    group_by: Optional[str] = Field(
+        default=None,
+        description="Field key whose text value groups the aggregates, or 'document_type'"
+    )
+    limit: int = Field(default=50, ge=0, le=1000)
+    offset: int = Field(default=0, ge=0)
+
+
+class FieldQueryResponse(BaseModel):
+    total: int
+    results: List[Dict[str, Any]]
+    aggregates: List[Dict[str, Any]] = Field(default_factory=list)
+
+
+class SearchHit(BaseModel):
+    job_id: str
+    document_type: Optional[str] = None
+    page: int
+    snippet: str
+    rank: float
+
+
+class SearchResponse(BaseModel):
+    total: int
+    results: List[SearchHit]
+
+
+class ExtractionLimits(BaseModel):
+    rate_per_minute: Optional[float] = Field(default=None, gt=0)
+    burst: Optional[float] = Field(default=None, gt=0)
+    weight: Optional[float] = Field(default=None, gt=0, description="Fair-share weight in the job scheduler")
+    daily_budget_usd: Optional[float] = Field(
+        default=None, gt=0, description="Estimated model spend allowed per UTC day"
+    )
@@ -84,6 +84,20 @@ async def get_current_user(
     except Exception:
         raise credentials_exception
 
+def is_admin_email(email: str) -> bool:
+    admin_emails = {
+        address.strip().lower() for address in settings.ADMIN_EMAILS.split(",") if address.strip()
+    }
+    return bool(email) and email.lower() in admin_emails
+
+async def get_current_admin(current_user=Depends(get_current_user)):
+    if not is_admin_email(current_user.email):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin privileges required",
+        )
+    return current_user
+
 def authenticate_user(db: Session, email: str, password: str):
     user = crud.user.get_by_email(db, email)
     if not user:
@@ -0,0 +1,275 @@
+import asyncio
+import logging
+import uuid
+from types import SimpleNamespace
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+from server.schemas.extraction import DocumentType, JobStatus
+from server.utils.config import settings
+from server.utils.page_images import is_scanned_page, scanned_page_numbers
+from server.utils.usage import BATCH_PRICE_FACTOR, BudgetExceeded
+
+logger = logging.getLogger(__name__)
+
+
+class LocalMessageBatches:
+    """In-process stand-in for the provider's message-batch API.
+
+    Mirrors the create/retrieve/results surface of `client.beta.messages.batches`
+    but answers every request through a regular messages client, so bulk mode can
+    be exercised locally or against a fake client.
+    """
+
+    def __init__(self, messages):
+        self.messages = messages
+        self.batches: Dict[str, Dict[str, Any]] = {}
+
+    def create(self, requests: List[Dict[str, Any]]):
+        batch_id = f"local_batch_{uuid.uuid4().hex}"
+        results = []
+        for request in requests:
+            try:
+                message = self.messages.create(**request["params"])
+                result = SimpleNamespace(type="succeeded", message=message)
+            except Exception as e:
+                result = SimpleNamespace(type="errored", error=str(e))
+            results.append(SimpleNamespace(custom_id=request["custom_id"], result=result))
+
+        self.batches[batch_id] = {"results": results}
+        return self.retrieve(batch_id)
+
+    def retrieve(self, message_batch_id: str):
+        return SimpleNamespace(id=message_batch_id, processing_status="ended")
+
+    def results(self, message_batch_id: str):
+        return iter(self.batches.pop(message_batch_id)["results"])
+
+
+class BulkExtractionRunner:
+    """Packs pending bulk jobs into message-batch submissions.
+
+    Jobs are collected for a short window, parsed, classified (when the document
+    type is auto) and extracted in batches, then the per-request results are
+    fanned back into the individual jobs of the owning `ExtractionService`.
+    """
+
+    def __init__(self, service, batches=None):
+        self.service = service
+        self._batches = batches
+        self.pending: List[Tuple[str, str]] = []
+        self._task: Optional[asyncio.Task] = None
+        # Submitted batches; held so they are not garbage collected while in flight
+        self._running: Set[asyncio.Task] = set()
+
+    @property
+    def batches(self):
+        if self._batches is None:
+            if settings.BULK_BATCH_BACKEND == "local":
+                self._batches = LocalMessageBatches(self.service.client.messages)
+            else:
+                self._batches = self.service.client.beta.messages.batches
+        return self._batches
+
+    def enqueue(self, job_id: str, document_type: str):
+        self.pending.append((job_id, document_type))
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._drain())
+
+    def remove(self, job_id: str) -> bool:
+        """Drop a job that has not been collected into a batch yet."""
+        remaining = [entry for entry in self.pending if entry[0] != job_id]
+        removed = len(remaining) != len(self.pending)
+        self.pending = remaining
+        return removed
+
+    async def _drain(self):
+        """Collect pending jobs and start a batch per chunk without waiting for it.
+
+        Batches can take hours to end, so jobs queued meanwhile go out in the
+        next collection window rather than behind the batches in flight.
+        """
+        while self.pending:
+            await asyncio.sleep(settings.BULK_COLLECT_WINDOW_SECONDS)
+
+            collected, self.pending = self.pending, []
+            size = max(1, settings.BULK_MAX_BATCH_SIZE)
+            for i in range(0, len(collected), size):
+                chunk = collected[i:i + size]
+                task = asyncio.create_task(self._run_batch(chunk))
+                self._running.add(task)
+                task.add_done_callback(lambda done, chunk=chunk: self._batch_finished(chunk, done))
+
+    def _batch_finished(self, entries: List[Tuple[str, str]], task: asyncio.Task):
+        self._running.discard(task)
+        error = None if task.cancelled() else task.exception()
+        if error is not None:
+            logger.error(f"Bulk batch of {len(entries)} jobs crashed: {error}")
+            self._fail_unfinished(entries, f"Bulk batch failed: {error}")
+
+    def _fail_unfinished(self, entries: List[Tuple[str, str]], error: str):
+        for job_id, _ in entries:
+            job = self.service.jobs.get(job_id)
+            if job is not None and job["status"] in (JobStatus.PENDING, JobStatus.PROCESSING):
+                self.service.fail_job(job_id, error)
+
+    async def _run_batch(self, entries: List[Tuple[str, str]]):
+        jobs = self.service.jobs
+        texts: Dict[str, str] = {}
+        images: Dict[str, Dict[int, bytes]] = {}
+        document_types: Dict[str, str] = {}
+
+        for job_id, document_type in entries:
+            if self.service.is_cancelled(job_id):
+                continue
+            # Cancelling drops the job's PDF bytes, so read them before the parse yields
+            pdf_bytes = jobs[job_id].get("pdf_bytes")
+            self.service.update_job(job_id, status=JobStatus.PROCESSING, progress=10)
+            try:
+                pages = await self.service.get_pages(job_id, pdf_bytes)
+                if self.service.is_cancelled(job_id):
+                    continue
+                images[job_id] = await self.service.scanned_page_images(
+                    job_id, pdf_bytes, scanned_page_numbers(pages)
+                )
+            except Exception as e:
+                self.service.fail_job(job_id, str(e))
+                continue
+            texts[job_id] = self.service.join_pages(pages)
+            document_types[job_id] = document_type
+            self.service.update_job(job_id, pages=pages, progress=30)
+
+        models: Dict[str, str] = {}
+        for job_id in list(document_types):
+            model = await self._model_within_budget(job_id)
+            if model is None:
+                del document_types[job_id]
+                continue
+            models[job_id] = model
+
+        to_classify = [
+            job_id for job_id, document_type in document_types.items()
+            if document_type == DocumentType.AUTO
+        ]
+        if to_classify:
+            results = await self._submit([
+                self._request(
+                    job_id,
+                    models[job_id],
+                    self.service.get_classification_prompt(texts[job_id]),
+                    10,
+                    # Text-less documents are classified from their first page image
+                    dict(list(images[job_id].items())[:1]) if is_scanned_page(texts[job_id]) else None,
+                )
+                for job_id in to_classify
+            ], to_classify)
+            for job_id in to_classify:
+                message, error = results[job_id]
+                if message is None:
+                    self.service.fail_job(job_id, error)
+                    del document_types[job_id]
+                    continue
+                self._record_usage(job_id, message, "classification")
+                document_types[job_id] = self.service.normalize_document_type(message.content[0].text)
+
+        for job_id, document_type in document_types.items():
+            self.service.update_job(job_id, document_type=document_type, progress=50)
+
+        job_ids = []
+        for job_id in document_types:
+            if self.service.is_cancelled(job_id):
+                continue
+            # Classification spend may have used up the rest of the budget
+            model = await self._model_within_budget(job_id) if job_id in to_classify else models[job_id]
+            if model is not None:
+                models[job_id] = model
+                job_ids.append(job_id)
+        if not job_ids:
+            return
+
+        results = await self._submit([
+            self._request(
+                job_id,
+                models[job_id],
+                self.service.get_extraction_prompt(
+                    document_types[job_id], texts[job_id], scanned_pages=sorted(images[job_id])
+                ),
+                4096,
+                images[job_id],
+            )
+            for job_id in job_ids
+        ], job_ids)
+
+        for job_id in job_ids:
+            message, error = results[job_id]
+            if message is None:
+                self.service.fail_job(job_id, error)
+                continue
+            self._record_usage(job_id, message, "extraction")
+            self.service.update_job(job_id, progress=90)
+            result = self.service.parse_extraction_response(
+                message.content[0].text, document_types[job_id]
+            )
+            self.service.complete_job(job_id, result)
+
+    async def _model_within_budget(self, job_id: str) -> Optional[str]:
+        """The model a job's next request may use; fails the job when its budget is spent."""
+        try:
+            models = await self.service.models_within_budget(
+                self.service.jobs.get(job_id), self.service.models_to_try
+            )
+        except BudgetExceeded as e:
+            self.service.fail_job(job_id, str(e))
+            return None
+        return models[0]
+
+    def _record_usage(self, job_id: str, message, purpose: str):
+        self.service.usage.record(
+            self.service.jobs.get(job_id),
+            getattr(message, "model", None) or self.service.models_to_try[0],
+            purpose,
+            getattr(message, "usage", None),
+            price_factor=BATCH_PRICE_FACTOR,
+        )
+
+    def _request(
+        self,
+        job_id: str,
+        model: str,
+        prompt: str,
+        max_tokens: int,
+        images: Optional[Dict[int, bytes]] = None
+    ) -> Dict[str, Any]:
+        return {
+            "custom_id": job_id,
+            "params": {
+                "model": model,
+                "max_tokens": max_tokens,
+                "messages": [{"role": "user", "content": self.service.message_content(prompt, images)}],
+            },
+        }
+
+    async def _submit(
+        self, requests: List[Dict[str, Any]], job_ids: List[str]
+    ) -> Dict[str, Tuple[Any, Optional[str]]]:
+        """Submit one batch, poll until it ends and map results by job id."""
+        outcome: Dict[str, Tuple[Any, Optional[str]]] = {
+            job_id: (None, "Batch request returned no result") for job_id in job_ids
+        }
+
+        try:
+            batch = await asyncio.to_thread(self.batches.create, requests=requests)
+            while batch.processing_status != "ended":
+                await asyncio.sleep(settings.BULK_POLL_INTERVAL_SECONDS)
+                batch = await asyncio.to_thread(self.batches.retrieve, batch.id)
+
+            responses = await asyncio.to_thread(lambda: list(self.batches.results(batch.id)))
+        except Exception as e:
+            return {job_id: (None, f"Batch submission failed: {e}") for job_id in job_ids}
+
+        for response in responses:
+            result = response.result
+            if result.type == "succeeded":
+                outcome[response.custom_id] = (result.message, None)
+            else:
+                outcome[response.custom_id] = (None, f"Batch request {result.type}")
+        return outcome
@@ -0,0 +1,87 @@
+import threading
+from typing import Any, Dict, List, Optional
+
+from server.utils.config import settings
+from server.utils.field_values import to_number
+
+
+def confidence_threshold(document_type: str) -> float:
+    return settings.CASCADE_CONFIDENCE_THRESHOLDS.get(
+        document_type, settings.CASCADE_DEFAULT_CONFIDENCE_THRESHOLD
+    )
+
+
+def extracted_fields(result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [
+        field for field in result.get("fields") or []
+        if isinstance(field, dict) and field.get("key")
+    ]
+
+
+def low_confidence_fields(fields: List[Dict[str, Any]], threshold: float) -> List[Dict[str, Any]]:
+    return [
+        field for field in fields
+        if (to_number(field.get("confidence")) or 0.0) < threshold
+    ]
+
+
+class CascadeStats:
+    """Counts cascade outcomes and the cost and latency they saved.
+
+    Savings compare each cascaded job against running its extraction prompt on
+    the strongest model: cost from the fast pass's token usage at that model's
+    prices, latency from the strong model's median observed latency.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.per_type: Dict[str, Dict[str, int]] = {}
+        self.cost_usd = 0.0
+        self.baseline_cost_usd = 0.0
+        self.seconds = 0.0
+        self.baseline_seconds = 0.0
+
+    def record(
+        self,
+        document_type: str,
+        escalation: str,
+        cost_usd: float,
+        baseline_cost_usd: float,
+        seconds: float,
+        baseline_seconds: Optional[float],
+    ):
+        with self.lock:
+            counts = self.per_type.setdefault(
+                document_type, {"jobs": 0, "none": 0, "fields": 0, "document": 0}
+            )
+            counts["jobs"] += 1
+            counts[escalation] += 1
+            self.cost_usd += cost_usd
+            self.baseline_cost_usd += baseline_cost_usd
+            if baseline_seconds is not None:
+                self.seconds += seconds
+                self.baseline_seconds += baseline_seconds
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            jobs = sum(counts["jobs"] for counts in self.per_type.values())
+            escalated = sum(
+                counts["fields"] + counts["document"] for counts in self.per_type.values()
+            )
+            return {
+                "enabled": settings.EXTRACTION_CASCADE_ENABLED,
+                "fast_model": settings.CASCADE_FAST_MODEL,
+                "jobs": jobs,
+                "escalation_rate": escalated / jobs if jobs else 0.0,
+                "document_types": {
+                    document_type: dict(
+                        counts,
+                        threshold=confidence_threshold(document_type),
+                        escalation_rate=(counts["fields"] + counts["document"]) / counts["jobs"],
+                    )
+                    for document_type, counts in self.per_type.items()
+                },
+                "estimated_cost_usd": round(self.cost_usd, 6),
+                "estimated_cost_saved_usd": round(self.baseline_cost_usd - self.cost_usd, 6),
+                "estimated_seconds_saved": round(self.baseline_seconds - self.seconds, 3),
+            }
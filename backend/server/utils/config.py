@@ -1,3 +1,5 @@
+from typing import Dict
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -21,4 +23,105 @@ class Settings(BaseSettings):
     NS_DATABASE_URL: str = ""
     DEBUG: str = "FALSE"
 
+    # Comma-separated emails allowed to use admin endpoints
+    ADMIN_EMAILS: str = ""
+
+    # Bulk extraction via the message-batch API ("anthropic" or "local")
+    BULK_BATCH_BACKEND: str = "anthropic"
+    BULK_MAX_BATCH_SIZE: int = 100
+    BULK_COLLECT_WINDOW_SECONDS: float = 5.0
+    BULK_POLL_INTERVAL_SECONDS: float = 30.0
+
+    # In-memory job retention
+    JOB_MEMORY_BUDGET_MB: int = 256
+    JOB_COMPLETED_TTL_SECONDS: int = 24 * 60 * 60
+    JOB_FAILED_TTL_SECONDS: int = 60 * 60
+    JOB_SPILL_DIR: str = ""
+    JOB_TTL_SWEEP_SECONDS: float = 60.0
+
+    # Upper bound for long-poll status queries
+    STATUS_LONG_POLL_MAX_SECONDS: float = 30.0
+
+    # Estimated Jaccard similarity at which a prior job counts as a near-duplicate
+    NEAR_DUPLICATE_THRESHOLD: float = 0.85
+
+    # Learned layout templates: jobs needed before a layout is trusted, and the
+    # per-field confidence below which the LLM fills the field instead
+    TEMPLATE_MIN_SUPPORT: int = 2
+    TEMPLATE_MIN_CONFIDENCE: float = 0.8
+
+    # Per-user fair-share scheduling and rate limiting (overridable per account
+    # through User.meta["extraction_limits"])
+    EXTRACTION_MAX_CONCURRENT_JOBS: int = 4
+    EXTRACTION_RATE_PER_MINUTE: float = 10.0
+    EXTRACTION_BURST: float = 20.0
+    EXTRACTION_DEFAULT_WEIGHT: float = 1.0
+
+    # Adaptive model timeouts (p99 of recent latencies x multiplier, clamped) and
+    # optional hedging: a second request after the p95 delay, capped at
+    # LLM_HEDGE_MAX_RATIO of requests
+    LLM_LATENCY_WINDOW: int = 200
+    LLM_LATENCY_MIN_SAMPLES: int = 20
+    LLM_TIMEOUT_MULTIPLIER: float = 2.0
+    LLM_TIMEOUT_MIN_SECONDS: float = 15.0
+    LLM_TIMEOUT_MAX_SECONDS: float = 300.0
+    LLM_HEDGING_ENABLED: bool = False
+    LLM_HEDGE_MAX_RATIO: float = 0.05
+    LLM_HEDGE_MAX_BURST: float = 5.0
+
+    # Model cascade: extract with the fast model first and escalate to the
+    # regular models when fields fall below the per-document-type confidence
+    # threshold (the whole document once more than the given share is low)
+    EXTRACTION_CASCADE_ENABLED: bool = False
+    CASCADE_FAST_MODEL: str = "claude-3-haiku-20240307"
+    CASCADE_CONFIDENCE_THRESHOLDS: Dict[str, float] = {
+        "financial": 0.85,
+        "legal": 0.85,
+        "clinical": 0.9,
+        "general": 0.7,
+    }
+    CASCADE_DEFAULT_CONFIDENCE_THRESHOLD: float = 0.8
+    CASCADE_DOCUMENT_ESCALATION_RATIO: float = 0.5
+
+    # Parsed page text kept in memory (most recently used PDFs); all of it is
+    # persisted in the parse_artifacts table
+    PARSE_ARTIFACT_CACHE_SIZE: int = 256
+
+    # Per-user daily model budget in estimated USD (0 = unlimited, overridable
+    # per account); over-budget work is rejected or moved to the downgrade model
+    USER_DAILY_BUDGET_USD: float = 0.0
+    USAGE_BUDGET_ACTION: str = "reject"
+    USAGE_DOWNGRADE_MODEL: str = "claude-3-haiku-20240307"
+
+    # Shared outbound HTTP clients (per-service pools with keep-alive)
+    HTTP2_ENABLED: bool = True
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 60.0
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    HTTP_DEFAULT_TIMEOUT_SECONDS: float = 30.0
+    HTTP_GOOGLE_TIMEOUT_SECONDS: float = 10.0
+    HTTP_ANTHROPIC_TIMEOUT_SECONDS: float = 600.0
+
+    # Scanned pages: pages with fewer extracted characters than
+    # SCANNED_PAGE_MIN_CHARS are rendered (long side at most SCANNED_PAGE_MAX_PX)
+    # and sent to the model as images, at most SCANNED_PAGE_MAX_IMAGES per request
+    SCANNED_PAGE_MIN_CHARS: int = 20
+    SCANNED_PAGE_MAX_PX: int = 1568
+    SCANNED_PAGE_JPEG_QUALITY: int = 80
+    SCANNED_PAGE_MAX_IMAGES: int = 20
+    SCANNED_PAGE_RENDER_WORKERS: int = 2
+    SCANNED_PAGE_CACHE_SIZE: int = 256
+
+    # Rows per chunk written by /extraction/export (and per Parquet row group)
+    EXPORT_BATCH_ROWS: int = 1000
+
+    # Sampling profiler: admins opt in per request with an "X-Profile: 1" header
+    # (jobs created by that request are profiled too); PROFILE_SAMPLE_RATE
+    # additionally profiles that fraction of all requests and jobs
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_INTERVAL_MS: float = 5.0
+    PROFILE_MAX_SAMPLES: int = 20000
+    PROFILE_MAX_STORED: int = 20
+
 settings = Settings()
\ No newline at end of file
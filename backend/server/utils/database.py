@@ -19,10 +19,13 @@ if not DB_URL:
     DB_URL = "sqlite:///./app.db"
 
 if DB_URL.startswith("sqlite"):
+    # Request handlers, to_thread workers and the job hook thread all hit the
+    # database; each needs its own connection, since a shared one also shares
+    # transactions. Only an in-memory database must stay on a single connection.
     engine = create_engine(
         DB_URL,
         echo=False,
-        poolclass=StaticPool,
+        poolclass=StaticPool if ":memory:" in DB_URL else QueuePool,
         connect_args={
             "check_same_thread": False,
             "timeout": 20
@@ -1,29 +1,128 @@
 import os
 import base64
 import asyncio
-from typing import Dict, Any, List, Optional
-from datetime import datetime
-from anthropic import Anthropic
+import copy
+import json
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, Iterator, List, Optional
+from datetime import date, datetime, timedelta
+from anthropic import Anthropic, AsyncAnthropic
 from PyPDF2 import PdfReader
 import io
 
+from server import crud
 from server.schemas.extraction import DocumentType, JobStatus, ExtractedField
+from server.utils.batch_extraction import BulkExtractionRunner
+from server.utils.cascade import (
+    CascadeStats,
+    confidence_threshold,
+    extracted_fields,
+    low_confidence_fields,
+)
+from server.utils.config import settings
+from server.utils.job_events import JobChangeNotifier
+from server.utils.database import SessionLocal
+from server.utils.job_retention import JobRetentionManager
+from server.utils.latency import LatencyTracker, input_size_bucket
+from server.utils.layout_templates import LayoutTemplateStore
+from server.utils.page_images import PageImageRenderer, is_scanned_page, scanned_page_numbers
+from server.utils.page_stream import PageStream
+from server.utils.parse_artifacts import ParseArtifactStore, content_hash
+from server.utils.profiling import profiler
+from server.utils.revisions import carry_over_fields, match_unchanged_pages
+from server.utils.scheduling import FairShareScheduler, UserRateLimiter
+from server.utils.similarity import NearDuplicateIndex, minhash_signature, text_fingerprint
+from server.utils.usage import BudgetExceeded, UsageTracker, estimate_cost
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = {JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED}
+
+# Leading characters of the document the classification prompt looks at
+CLASSIFICATION_TEXT_CHARS = 1000
+
+
+class JobCancelled(Exception):
+    pass
 
 
 class ExtractionService:
+    models_to_try = [
+        "claude-3-5-sonnet-20241022",
+        "claude-3-opus-20240229",
+        "claude-3-sonnet-20240229",
+        "claude-3-haiku-20240307"
+    ]
+    
     def __init__(self):
         self.client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+        # Interactive calls use the async client so cancelling a job closes its request
+        self.async_client = AsyncAnthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+        self.cancel_events: Dict[str, threading.Event] = {}
         self.jobs: Dict[str, Dict[str, Any]] = {}
+        self.bulk_runner = BulkExtractionRunner(self)
+        self.retention = JobRetentionManager(self.jobs)
+        self.events = JobChangeNotifier()
+        self.similarity = NearDuplicateIndex()
+        self.templates = LayoutTemplateStore()
+        self.scheduler = FairShareScheduler()
+        self.rate_limiter = UserRateLimiter()
+        self.latency = LatencyTracker()
+        self.cascade = CascadeStats()
+        self.page_images = PageImageRenderer()
+        # Post-completion work (indexing etc.) runs off the extraction path, in order
+        self.hook_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-hooks")
+        self.completion_hooks: List[Callable[[Dict[str, Any]], None]] = [
+            self.index_fields,
+            self.index_pages,
+            self.index_similarity,
+            self.learn_template,
+        ]
+        self.usage = UsageTracker(self.hook_executor)
+        self.parse_artifacts = ParseArtifactStore(self.hook_executor)
     
-    def extract_text_from_pdf(self, pdf_bytes: bytes) -> str:
+    def use_http_client(self, http_client):
+        """Send interactive model calls through a shared pooled HTTP client."""
+        self.async_client = AsyncAnthropic(api_key=os.getenv("ANTHROPIC_API_KEY"), http_client=http_client)
+    
+    def extract_pages_from_pdf(
+        self,
+        pdf_bytes: bytes,
+        cancel_event: Optional[threading.Event] = None,
+        on_page: Optional[Callable[[str], None]] = None
+    ) -> List[str]:
         pdf_file = io.BytesIO(pdf_bytes)
         reader = PdfReader(pdf_file)
-        text = ""
+        pages = []
         for page in reader.pages:
-            text += page.extract_text() + "\n"
-        return text
+            if cancel_event is not None and cancel_event.is_set():
+                raise JobCancelled()
+            pages.append(page.extract_text())
+            if on_page is not None:
+                on_page(pages[-1])
+        return pages
     
-    def get_extraction_prompt(self, document_type: str, text: str) -> str:
+    def extract_text_from_pdf(self, pdf_bytes: bytes) -> str:
+        return self.join_pages(self.extract_pages_from_pdf(pdf_bytes))
+    
+    def join_pages(self, pages: List[str]) -> str:
+        return "".join(page + "\n" for page in pages)
+    
+    def join_numbered_pages(self, pages: Dict[int, str]) -> str:
+        """Join a subset of pages, marking each with its real page number."""
+        return "\n".join(f"--- Page {number} ---\n{content}" for number, content in pages.items())
+    
+    def get_extraction_prompt(
+        self,
+        document_type: str,
+        text: str,
+        seed_result: Optional[Dict[str, Any]] = None,
+        scanned_pages: Optional[List[int]] = None
+    ) -> str:
         base_prompt = f"""You are a document extraction AI. Extract structured data from the following {document_type} document.
 
 Document text:
@@ -77,135 +176,788 @@ Examples:
 - patient_name (text), date_of_birth (date), diagnosis (text), medications (text), procedures (text), physician_name (text), visit_date (date), patient_id (text), etc.
 """
         
+        if seed_result:
+            base_prompt += self.get_seed_hint(seed_result)
+        
+        if scanned_pages:
+            base_prompt += self.get_scanned_pages_hint(scanned_pages)
+        
         base_prompt += "\nProvide ONLY the JSON response, no additional text."
         return base_prompt
     
-    def detect_document_type(self, text: str) -> str:
-        prompt = f"""Analyze the following document text and determine its type. 
+    def get_field_extraction_prompt(
+        self, document_type: str, text: str, fields: List[Dict[str, Any]]
+    ) -> str:
+        requested = "\n".join(
+            f"- {field['key']} ({field.get('field_type') or 'text'}): {field.get('label') or field['key']}"
+            for field in fields
+        )
+        return f"""You are a document extraction AI. Extract ONLY the following fields from this {document_type} document:
+{requested}
+
+Document text:
+{text}
+
+For each field, provide key (exactly as listed), value, source_text (the EXACT verbatim text from the document), confidence (0.0 to 1.0), field_type, label and location ({{"page": 1, "region": "top"}}, page is 1-indexed).
+Omit fields that do not appear in the document.
+
+Return the data as a JSON object with this structure:
+{{
+  "document_type": "{document_type}",
+  "fields": [...]
+}}
+
+Provide ONLY the JSON response, no additional text."""
+    
+    def get_scanned_pages_hint(self, page_numbers: List[int]) -> str:
+        pages = ", ".join(str(number) for number in page_numbers)
+        return (
+            f"\nPage(s) {pages} are scanned and have no text layer; they are attached as images, "
+            "each preceded by its page number. Read those pages from the images, use that page "
+            "number in location, and copy source_text exactly as printed in the image.\n"
+        )
+    
+    def get_seed_hint(self, seed_result: Dict[str, Any]) -> str:
+        known_fields = [
+            f"- {field['key']} ({field.get('field_type') or 'text'}): {field.get('label') or field['key']}"
+            for field in seed_result.get("fields", [])
+            if isinstance(field, dict) and field.get("key") and field["key"] != "raw_extraction"
+        ]
+        if not known_fields:
+            return ""
+        return (
+            "\nA near-identical document was extracted before with the fields below. "
+            "Reuse these keys and types where they apply, but take every value from this document:\n"
+            + "\n".join(known_fields) + "\n"
+        )
+    
+    def get_classification_prompt(self, text: str) -> str:
+        return f"""Analyze the following document text and determine its type. 
 Choose from: financial, legal, clinical, or general.
 
-Document text (first 1000 characters):
-{text[:1000]}
+Document text (first {CLASSIFICATION_TEXT_CHARS} characters):
+{text[:CLASSIFICATION_TEXT_CHARS]}
 
 Respond with ONLY one word: financial, legal, clinical, or general."""
-        
-        models_to_try = [
-            "claude-3-5-sonnet-20241022",
-            "claude-3-opus-20240229",
-            "claude-3-sonnet-20240229",
-            "claude-3-haiku-20240307"
-        ]
-        
+    
+    def normalize_document_type(self, response_text: str) -> str:
+        detected_type = response_text.strip().lower()
+        if detected_type not in ["financial", "legal", "clinical"]:
+            detected_type = "general"
+        return detected_type
+    
+    async def create_message(
+        self,
+        prompt: str,
+        max_tokens: int,
+        models: Optional[List[str]] = None,
+        job_id: Optional[str] = None,
+        purpose: str = "extraction",
+        images: Optional[Dict[int, bytes]] = None
+    ):
+        job = self.jobs.get(job_id) if job_id else None
+        content = self.message_content(prompt, images)
+        input_bucket = input_size_bucket(prompt, len(images or {}))
         last_error = None
-        for model in models_to_try:
+        for model in await self.models_within_budget(job, models or self.models_to_try):
+            started = time.monotonic()
             try:
-                message = self.client.messages.create(
-                    model=model,
-                    max_tokens=10,
-                    messages=[{"role": "user", "content": prompt}]
-                )
-                
-                detected_type = message.content[0].text.strip().lower()
-                if detected_type not in ["financial", "legal", "clinical"]:
-                    detected_type = "general"
-                
-                return detected_type
+                with profiler.span("model_call", model=model, purpose=purpose):
+                    message = await self.latency.call(
+                        (model, max_tokens, input_bucket),
+                        lambda model=model: self.async_client.messages.create(
+                            model=model,
+                            max_tokens=max_tokens,
+                            messages=[{"role": "user", "content": content}]
+                        )
+                    )
             except Exception as e:
                 last_error = e
                 continue
+            self.usage.record(
+                job, model, purpose, getattr(message, "usage", None), time.monotonic() - started
+            )
+            return message
         
         raise Exception(f"All models failed. Last error: {last_error}")
     
-    async def process_pdf(self, job_id: str, pdf_bytes: bytes, document_type: str):
+    def message_content(self, prompt: str, images: Optional[Dict[int, bytes]] = None):
+        """The user turn: the prompt alone, or page images labelled by number followed by it."""
+        if not images:
+            return prompt
+        
+        content = []
+        for number, image in sorted(images.items()):
+            content.append({"type": "text", "text": f"--- Page {number} (scanned) ---"})
+            content.append({
+                "type": "image",
+                "source": {
+                    "type": "base64",
+                    "media_type": "image/jpeg",
+                    "data": base64.b64encode(image).decode("ascii"),
+                },
+            })
+        content.append({"type": "text", "text": prompt})
+        return content
+    
+    async def scanned_page_images(
+        self, job_id: str, pdf_bytes: Optional[bytes], page_numbers: List[int]
+    ) -> Dict[int, bytes]:
+        """Rendered images of a job's scanned pages, capped at SCANNED_PAGE_MAX_IMAGES.
+        
+        Pages that cannot be rendered (or whose PDF is gone and were never
+        rendered before) are left out and stay on the text path.
+        """
+        if not page_numbers:
+            return {}
+        if len(page_numbers) > settings.SCANNED_PAGE_MAX_IMAGES:
+            logger.warning(
+                f"Job {job_id} has {len(page_numbers)} scanned pages; "
+                f"sending the first {settings.SCANNED_PAGE_MAX_IMAGES} as images"
+            )
+            page_numbers = page_numbers[:settings.SCANNED_PAGE_MAX_IMAGES]
+        with profiler.span("render_scanned_pages", pages=len(page_numbers)):
+            return await self.page_images.render(self.jobs[job_id]["content_hash"], pdf_bytes, page_numbers)
+    
+    async def models_within_budget(self, job: Optional[Dict[str, Any]], models: List[str]) -> List[str]:
+        """Apply the job owner's daily budget before a call is made."""
+        if job is None or not job.get("daily_budget_usd"):
+            return models
+        # Spend is read from the database, so check it off the loop
+        over_budget = await asyncio.to_thread(
+            self.usage.over_budget, job.get("user_id"), job["daily_budget_usd"]
+        )
+        if not over_budget:
+            return models
+        if settings.USAGE_BUDGET_ACTION == "downgrade":
+            return [settings.USAGE_DOWNGRADE_MODEL]
+        raise BudgetExceeded("Daily model budget exhausted")
+    
+    async def detect_document_type(
+        self, text: str, job_id: Optional[str] = None, images: Optional[Dict[int, bytes]] = None
+    ) -> str:
+        message = await self.create_message(
+            self.get_classification_prompt(text), 10, job_id=job_id, purpose="classification", images=images
+        )
+        return self.normalize_document_type(message.content[0].text)
+    
+    def parse_extraction_response(self, response_text: str, document_type: str) -> Dict[str, Any]:
+        response_text = response_text.strip()
+        
+        if response_text.startswith("```json"):
+            response_text = response_text[7:]
+        if response_text.startswith("```"):
+            response_text = response_text[3:]
+        if response_text.endswith("```"):
+            response_text = response_text[:-3]
+        response_text = response_text.strip()
+        
         try:
-            self.jobs[job_id]["status"] = JobStatus.PROCESSING
-            self.jobs[job_id]["progress"] = 10
-            
-            text = self.extract_text_from_pdf(pdf_bytes)
-            self.jobs[job_id]["progress"] = 30
-            
-            if document_type == DocumentType.AUTO:
-                detected_type = self.detect_document_type(text)
-                document_type = detected_type
+            return json.loads(response_text)
+        except json.JSONDecodeError as e:
+            print(f"JSON Parse Error: {e}")
+            print(f"Raw response: {response_text[:500]}")
             
-            self.jobs[job_id]["document_type"] = document_type
-            self.jobs[job_id]["progress"] = 50
+            response_text = re.sub(r',(\s*[}\]])', r'\1', response_text)
+            response_text = re.sub(r"'", '"', response_text)
             
-            prompt = self.get_extraction_prompt(document_type, text)
+            try:
+                return json.loads(response_text)
+            except json.JSONDecodeError:
+                return {
+                    "document_type": document_type,
+                    "fields": [
+                        {
+                            "key": "raw_extraction",
+                            "value": response_text,
+                            "confidence": 0.5
+                        }
+                    ]
+                }
+    
+    def update_job(self, job_id: str, **changes):
+        job = self.jobs.get(job_id)
+        if job is None or job["status"] == JobStatus.CANCELLED:
+            return
+        job.update(changes)
+        job["version"] = job.get("version", 0) + 1
+        self.events.notify(job_id)
+    
+    def complete_job(self, job_id: str, result: Dict[str, Any]):
+        if self.is_cancelled(job_id):
+            return
+        self.update_job(
+            job_id,
+            status=JobStatus.COMPLETED,
+            progress=100,
+            result=result,
+            completed_at=datetime.utcnow().isoformat()
+        )
+        self.run_completion_hooks(job_id)
+        self.retention.on_job_finished(job_id)
+    
+    def run_completion_hooks(self, job_id: str):
+        job = {key: value for key, value in self.jobs[job_id].items() if key != "pdf_bytes"}
+        for hook in self.completion_hooks:
+            self.hook_executor.submit(self._run_hook, hook, job)
+    
+    def _run_hook(self, hook: Callable[[Dict[str, Any]], None], job: Dict[str, Any]):
+        try:
+            hook(job)
+        except Exception as e:
+            logger.error(f"Completion hook {hook.__name__} failed for job {job['job_id']}: {e}")
+    
+    def index_fields(self, job: Dict[str, Any]):
+        db = SessionLocal()
+        try:
+            crud.extracted_field.index_job(
+                db,
+                job["job_id"],
+                job.get("document_type"),
+                (job.get("result") or {}).get("fields", []),
+                user_id=job.get("user_id")
+            )
+        finally:
+            db.close()
+    
+    def index_pages(self, job: Dict[str, Any]):
+        if not job.get("pages"):
+            return
+        db = SessionLocal()
+        try:
+            crud.document_page.index_job(
+                db, job["job_id"], job.get("document_type"), job["pages"], user_id=job.get("user_id")
+            )
+        finally:
+            db.close()
+    
+    def index_similarity(self, job: Dict[str, Any]):
+        if not job.get("pages"):
+            return
+        text = self.join_pages(job["pages"])
+        signature = minhash_signature(text)
+        if signature is not None:
+            self.similarity.add(job["job_id"], signature, text_fingerprint(text), job.get("document_type"))
+    
+    def learn_template(self, job: Dict[str, Any]):
+        # Only learn from full LLM extractions; template output would reinforce itself
+        if not job.get("pages") or job.get("reused_from") or job.get("template"):
+            return
+        fields = (job.get("result") or {}).get("fields", [])
+        self.templates.learn(job["pages"], job.get("document_type"), fields, job.get("user_id"))
+    
+    def find_similar_jobs(self, text: str, user_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        signature = minhash_signature(text)
+        if signature is None:
+            return []
+        
+        matches = []
+        for match in self.similarity.query(signature, text_fingerprint(text)):
+            job = self.jobs.get(match["job_id"])
+            if job is None or job["status"] != JobStatus.COMPLETED:
+                self.similarity.remove(match["job_id"])
+                continue
+            # Prior results are only reused within the same account
+            if job.get("user_id") == user_id:
+                matches.append(match)
+        return matches
+    
+    def is_cancelled(self, job_id: str) -> bool:
+        job = self.jobs.get(job_id)
+        return job is None or job["status"] == JobStatus.CANCELLED
+    
+    def cancel_job(self, job_id: str) -> bool:
+        """Drop a queued job or interrupt an in-flight one.
+        
+        Queued jobs leave the scheduler and bulk queues; a running job gets its
+        parse worker stopped at the next page boundary and its task cancelled,
+        which closes any open model request.
+        """
+        job = self.jobs.get(job_id)
+        if job is None or job["status"] in TERMINAL_STATUSES:
+            return False
+        
+        self.scheduler.remove(job_id)
+        self.bulk_runner.remove(job_id)
+        cancel_event = self.cancel_events.get(job_id)
+        if cancel_event is not None:
+            cancel_event.set()
+        self.scheduler.cancel(job_id)
+        
+        self.update_job(
+            job_id,
+            status=JobStatus.CANCELLED,
+            progress=0,
+            cancelled_at=datetime.utcnow().isoformat()
+        )
+        self.retention.on_job_finished(job_id)
+        return True
+    
+    def fail_job(self, job_id: str, error: str):
+        if self.is_cancelled(job_id):
+            return
+        self.update_job(job_id, status=JobStatus.FAILED, error=error, progress=0)
+        self.retention.on_job_finished(job_id)
+    
+    async def process_pdf(self, job_id: str, pdf_bytes: bytes, document_type: str):
+        job = self.jobs.get(job_id)
+        if job is not None and job.get("profile"):
+            with profiler.profile("job", job_id):
+                await self._process_pdf(job_id, pdf_bytes, document_type)
+        else:
+            with profiler.detached():
+                await self._process_pdf(job_id, pdf_bytes, document_type)
+    
+    async def _process_pdf(self, job_id: str, pdf_bytes: bytes, document_type: str):
+        cancel_event = self.cancel_events.setdefault(job_id, threading.Event())
+        classification = None
+        try:
+            self.update_job(job_id, status=JobStatus.PROCESSING, progress=10)
             
-            models_to_try = [
-                "claude-3-5-sonnet-20241022",
-                "claude-3-opus-20240229",
-                "claude-3-sonnet-20240229",
-                "claude-3-haiku-20240307"
-            ]
+            # Classify from the leading pages while the rest of a fresh parse continues;
+            # the task is dropped if reuse or a template makes it unnecessary. Revisions
+            # take the previous version's type, so they never speculate
+            speculate = document_type == DocumentType.AUTO and not self.jobs[job_id].get("previous_job_id")
+            stream = PageStream() if speculate else None
+            if stream is not None:
+                classification = asyncio.create_task(self.classify_page_stream(job_id, stream))
+            try:
+                with profiler.span("parse"):
+                    pages = await self.get_pages(job_id, pdf_bytes, cancel_event, stream)
+            finally:
+                if stream is not None:
+                    stream.finish()
+            text = self.join_pages(pages)
+            # Pages without a text layer are sent as images; their content is unknown
+            # here, so text similarity cannot vouch for the whole document
+            scanned = scanned_page_numbers(pages)
+            with profiler.span("similarity"):
+                similar_jobs = await asyncio.to_thread(
+                    self.find_similar_jobs, text, self.jobs[job_id].get("user_id")
+                )
+            self.update_job(job_id, pages=pages, similar_jobs=similar_jobs, progress=30)
             
-            message = None
-            last_error = None
-            for model in models_to_try:
-                try:
-                    message = self.client.messages.create(
-                        model=model,
-                        max_tokens=4096,
-                        messages=[{"role": "user", "content": prompt}]
+            previous_job_id = self.jobs[job_id].get("previous_job_id")
+            if previous_job_id:
+                with profiler.span("revision", previous_job_id=previous_job_id):
+                    result = await self.extract_revision(
+                        job_id, pages, previous_job_id, document_type, pdf_bytes
                     )
-                    break
-                except Exception as e:
-                    last_error = e
-                    continue
+                if result is not None:
+                    self.complete_job(job_id, result)
+                    return
             
-            if message is None:
-                raise Exception(f"All models failed. Last error: {last_error}")
+            seed_match = next((
+                match for match in similar_jobs
+                if match["document_type"] and document_type in (DocumentType.AUTO, match["document_type"])
+            ), None)
+            seed_result = (
+                await asyncio.to_thread(self.retention.load_result, seed_match["job_id"])
+                if seed_match else None
+            )
             
-            self.jobs[job_id]["progress"] = 90
+            if seed_result is not None and seed_match["exact"] and not scanned:
+                self.similarity.record_reuse("exact")
+                self.update_job(
+                    job_id, document_type=seed_match["document_type"], reused_from=seed_match["job_id"]
+                )
+                self.complete_job(job_id, copy.deepcopy(seed_result))
+                return
             
-            response_text = message.content[0].text.strip()
+            template = self.templates.apply(pages, self.jobs[job_id].get("user_id"))
+            if template and document_type in (DocumentType.AUTO, template["document_type"]):
+                with profiler.span("template", fingerprint=template["fingerprint"]):
+                    result = await self.extract_with_template(job_id, template, text, scanned, pdf_bytes)
+                self.complete_job(job_id, result)
+                return
             
-            if response_text.startswith("```json"):
-                response_text = response_text[7:]
-            if response_text.startswith("```"):
-                response_text = response_text[3:]
-            if response_text.endswith("```"):
-                response_text = response_text[:-3]
-            response_text = response_text.strip()
+            if document_type == DocumentType.AUTO:
+                if seed_result is not None:
+                    self.similarity.record_reuse("document_type")
+                    document_type = seed_match["document_type"]
+                else:
+                    with profiler.span("classification"):
+                        detected_type = await classification if classification is not None else None
+                        if detected_type is None:
+                            # Documents without any text are classified from their first page image
+                            images = None
+                            if is_scanned_page(text):
+                                images = await self.scanned_page_images(job_id, pdf_bytes, scanned[:1])
+                            detected_type = await self.detect_document_type(text, job_id, images)
+                    document_type = detected_type
             
-            import json
-            import re
+            self.update_job(job_id, document_type=document_type, progress=50)
             
-            try:
-                result = json.loads(response_text)
-            except json.JSONDecodeError as e:
-                print(f"JSON Parse Error: {e}")
-                print(f"Raw response: {response_text[:500]}")
-                
-                response_text = re.sub(r',(\s*[}\]])', r'\1', response_text)
-                response_text = re.sub(r"'", '"', response_text)
-                
-                try:
-                    result = json.loads(response_text)
-                except json.JSONDecodeError:
-                    result = {
-                        "document_type": document_type,
-                        "fields": [
-                            {
-                                "key": "raw_extraction",
-                                "value": response_text,
-                                "confidence": 0.5
-                            }
-                        ]
-                    }
+            if seed_result is not None:
+                self.similarity.record_reuse("seeded")
+            images = await self.scanned_page_images(job_id, pdf_bytes, scanned)
+            prompt = self.get_extraction_prompt(document_type, text, seed_result, sorted(images))
+            with profiler.span("extraction", document_type=document_type):
+                if settings.EXTRACTION_CASCADE_ENABLED:
+                    result = await self.extract_with_cascade(job_id, document_type, text, prompt, images)
+                else:
+                    message = await self.create_message(prompt, 4096, job_id=job_id, images=images)
+                    result = self.parse_extraction_response(message.content[0].text, document_type)
+            if scanned:
+                result["scanned_pages"] = scanned
             
-            self.jobs[job_id]["status"] = JobStatus.COMPLETED
-            self.jobs[job_id]["progress"] = 100
-            self.jobs[job_id]["result"] = result
-            self.jobs[job_id]["completed_at"] = datetime.utcnow().isoformat()
+            self.update_job(job_id, progress=90)
+            self.complete_job(job_id, result)
             
         except Exception as e:
-            self.jobs[job_id]["status"] = JobStatus.FAILED
-            self.jobs[job_id]["error"] = str(e)
-            self.jobs[job_id]["progress"] = 0
+            self.fail_job(job_id, str(e))
+        finally:
+            self.cancel_events.pop(job_id, None)
+            if classification is not None:
+                if not classification.done():
+                    classification.cancel()
+                elif not classification.cancelled():
+                    classification.exception()
+    
+    async def classify_page_stream(self, job_id: str, stream: PageStream) -> Optional[str]:
+        """Detect the document type as soon as enough leading text has been parsed.
+        
+        Returns None when the pages did not come from a live parse or the layout
+        has a learned template, leaving classification (if still needed) to run on
+        the full text as before.
+        """
+        text = await stream.leading_text(CLASSIFICATION_TEXT_CHARS)
+        if text is None or is_scanned_page(text):
+            return None
+        # A known layout may be filled by its template without any model call
+        if self.templates.matches(stream.pages, self.jobs[job_id].get("user_id")):
+            return None
+        return await self.detect_document_type(text, job_id)
+    
+    async def get_pages(
+        self,
+        job_id: str,
+        pdf_bytes: Optional[bytes],
+        cancel_event: Optional[threading.Event] = None,
+        stream: Optional[PageStream] = None
+    ) -> List[str]:
+        """Page text of a job's PDF, parsed at most once per distinct content."""
+        key = self.jobs[job_id]["content_hash"]
+        pages = await asyncio.to_thread(self.parse_artifacts.get, key)
+        if pages is not None:
+            return pages
+        if pdf_bytes is None:
+            raise ValueError("Parsed pages for this document are no longer available")
+        
+        pages = await asyncio.to_thread(
+            self.extract_pages_from_pdf, pdf_bytes, cancel_event, stream.push if stream else None
+        )
+        self.parse_artifacts.put(key, pages)
+        return pages
+    
+    async def extract_revision(
+        self,
+        job_id: str,
+        pages: List[str],
+        previous_job_id: str,
+        document_type: str,
+        pdf_bytes: Optional[bytes] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Extract a revised document by only sending the pages that changed.
+        
+        Fields the previous version located on pages that are still present are
+        carried over at their new page numbers; the changed pages are extracted with
+        the previous result as a key hint and win over carried-over fields with the
+        same key. Returns None when the previous version cannot be used.
+        """
+        previous = self.jobs.get(previous_job_id)
+        if previous is None or previous["status"] != JobStatus.COMPLETED:
+            return None
+        if document_type not in (DocumentType.AUTO, previous.get("document_type")):
+            return None
+        previous_result = await asyncio.to_thread(self.retention.load_result, previous_job_id)
+        previous_pages = await asyncio.to_thread(self.parse_artifacts.get, previous["content_hash"])
+        if not previous_result or not previous_pages:
+            return None
+        
+        unchanged = match_unchanged_pages(previous_pages, pages)
+        if not unchanged:
+            return None
+        
+        document_type = previous["document_type"]
+        self.update_job(job_id, document_type=document_type, progress=50)
+        
+        fields = carry_over_fields(previous_result.get("fields", []), unchanged, previous_job_id)
+        carried = len(fields)
+        # Scanned pages never match by text, so they are always sent again as images
+        scanned = set(scanned_page_numbers(pages))
+        changed = [
+            number for number, page in enumerate(pages, start=1)
+            if number not in unchanged and (number in scanned or page.strip())
+        ]
+        if changed:
+            images = await self.scanned_page_images(
+                job_id, pdf_bytes, [number for number in changed if number in scanned]
+            )
+            text = self.join_numbered_pages({
+                number: pages[number - 1] for number in changed if number not in scanned
+            })
+            prompt = self.get_extraction_prompt(document_type, text, previous_result, sorted(images))
+            message = await self.create_message(
+                prompt, 4096, job_id=job_id, purpose="revision", images=images
+            )
+            fresh = extracted_fields(self.parse_extraction_response(message.content[0].text, document_type))
+            fresh_keys = {field["key"] for field in fresh}
+            fields = [field for field in fields if field["key"] not in fresh_keys] + fresh
+        
+        self.update_job(job_id, progress=90)
+        return {
+            "document_type": document_type,
+            "fields": fields,
+            **({"scanned_pages": sorted(scanned)} if scanned else {}),
+            "revision": {
+                "previous_job_id": previous_job_id,
+                "changed_pages": changed,
+                "unchanged_pages": sorted(unchanged),
+                "carried_over_fields": carried,
+            },
+        }
+    
+    async def extract_with_cascade(
+        self,
+        job_id: str,
+        document_type: str,
+        text: str,
+        prompt: str,
+        images: Optional[Dict[int, bytes]] = None
+    ) -> Dict[str, Any]:
+        """Extract with the fast model, escalating only what it was unsure about.
+        
+        Fields under the document type's confidence threshold are re-extracted by
+        the regular models with a focused prompt; if the fast pass failed, parsed
+        no fields, or most of its fields are low, the whole document is escalated.
+        """
+        started = time.monotonic()
+        strong_model = self.models_to_try[0]
+        threshold = confidence_threshold(document_type)
+        cost = baseline_cost = 0.0
+        
+        try:
+            message = await self.create_message(
+                prompt,
+                4096,
+                models=[settings.CASCADE_FAST_MODEL],
+                job_id=job_id,
+                purpose="cascade_fast",
+                images=images
+            )
+            result = self.parse_extraction_response(message.content[0].text, document_type)
+            cost += estimate_cost(settings.CASCADE_FAST_MODEL, getattr(message, "usage", None))
+            baseline_cost += estimate_cost(strong_model, getattr(message, "usage", None))
+            fields = extracted_fields(result)
+        except BudgetExceeded:
+            raise
+        except Exception as e:
+            logger.warning(f"Fast model pass failed for job {job_id}: {e}")
+            result, fields = None, []
+        
+        self.update_job(job_id, progress=70)
+        
+        low = low_confidence_fields(fields, threshold)
+        parse_failed = any(field["key"] == "raw_extraction" for field in fields)
+        if not fields or parse_failed or len(low) > len(fields) * settings.CASCADE_DOCUMENT_ESCALATION_RATIO:
+            escalation = "document"
+            message = await self.create_message(
+                prompt, 4096, job_id=job_id, purpose="escalation", images=images
+            )
+            cost += estimate_cost(getattr(message, "model", strong_model), getattr(message, "usage", None))
+            if result is None:
+                baseline_cost += estimate_cost(strong_model, getattr(message, "usage", None))
+            result = self.parse_extraction_response(message.content[0].text, document_type)
+        elif low:
+            escalation = "fields"
+            field_prompt = self.get_field_extraction_prompt(document_type, text, low)
+            if images:
+                field_prompt += self.get_scanned_pages_hint(sorted(images))
+            message = await self.create_message(
+                field_prompt, 4096, job_id=job_id, purpose="escalation", images=images
+            )
+            cost += estimate_cost(getattr(message, "model", strong_model), getattr(message, "usage", None))
+            escalated = {
+                field["key"]: dict(field, extracted_by="escalated")
+                for field in extracted_fields(
+                    self.parse_extraction_response(message.content[0].text, document_type)
+                )
+            }
+            result["fields"] = [escalated.pop(field["key"], field) for field in fields]
+            result["fields"].extend(escalated.values())
+        else:
+            escalation = "none"
+        
+        seconds = time.monotonic() - started
+        self.cascade.record(
+            document_type,
+            escalation,
+            cost,
+            baseline_cost,
+            seconds,
+            self.latency.percentile(
+                (strong_model, 4096, input_size_bucket(prompt, len(images or {}))), 50
+            ),
+        )
+        result["cascade"] = {
+            "fast_model": settings.CASCADE_FAST_MODEL,
+            "threshold": threshold,
+            "escalation": escalation,
+            "escalated_fields": [field["key"] for field in low] if escalation == "fields" else [],
+        }
+        return result
     
-    def create_job(self, pdf_bytes: bytes, document_type: str) -> str:
+    async def reextract_fields(self, job_id: str, keys: List[str]) -> Dict[str, Any]:
+        """Extract selected fields of a completed job again and merge them into its result.
+        
+        The prompt only carries the pages the fields were found on (all pages when a
+        field has no location) and asks for just those keys.
+        """
+        job = self.jobs.get(job_id)
+        if job is None or job["status"] != JobStatus.COMPLETED:
+            raise ValueError("Only completed jobs can be re-extracted")
+        
+        result = copy.deepcopy(await asyncio.to_thread(self.retention.load_result, job_id) or {})
+        document_type = job.get("document_type") or result.get("document_type") or "general"
+        current = {
+            field["key"]: field for field in result.get("fields", [])
+            if isinstance(field, dict) and field.get("key")
+        }
+        keys = list(dict.fromkeys(keys))
+        requested = [current.get(key) or {"key": key} for key in keys]
+        
+        page_numbers = set()
+        for field in requested:
+            location = field.get("location")
+            page = location.get("page") if isinstance(location, dict) else None
+            if not isinstance(page, int):
+                page_numbers = None
+                break
+            page_numbers.add(page)
+        
+        # Scanned pages have no stored text, so they are sent as images instead
+        scanned = set(result.get("scanned_pages") or [])
+        images = await self.scanned_page_images(job_id, job.get("pdf_bytes"), sorted(
+            scanned if page_numbers is None else scanned & page_numbers
+        ))
+        text_pages = None if page_numbers is None else page_numbers - scanned
+        pages = {}
+        if text_pages is None or text_pages:
+            pages = await asyncio.to_thread(self.load_pages, job_id, sorted(text_pages or []))
+        if not pages and not images:
+            raise ValueError("Page text for this job is no longer available")
+        
+        text = self.join_numbered_pages(pages)
+        prompt = self.get_field_extraction_prompt(document_type, text, requested)
+        if images:
+            prompt += self.get_scanned_pages_hint(sorted(images))
+        message = await self.create_message(
+            prompt, 1024, job_id=job_id, purpose="reextraction", images=images
+        )
+        response = self.parse_extraction_response(message.content[0].text, document_type)
+        answers = {
+            field["key"]: dict(field, extracted_by="reextracted")
+            for field in response.get("fields", [])
+            if isinstance(field, dict) and field.get("key") in keys
+        }
+        
+        result["fields"] = [
+            answers.pop(field.get("key"), field) if isinstance(field, dict) else field
+            for field in result.get("fields", [])
+        ]
+        result["fields"].extend(answers.values())
+        
+        self.retention.replace_result(job_id, result)
+        self.update_job(job_id, reextracted_at=datetime.utcnow().isoformat())
+        snapshot = {key: value for key, value in job.items() if key != "pdf_bytes"}
+        self.hook_executor.submit(self._run_hook, self.index_fields, snapshot)
+        return result
+    
+    def load_pages(self, job_id: str, page_numbers: List[int]) -> Dict[int, str]:
+        db = SessionLocal()
+        try:
+            return crud.document_page.get_pages(db, job_id, page_numbers)
+        finally:
+            db.close()
+    
+    async def extract_with_template(
+        self,
+        job_id: str,
+        template: Dict[str, Any],
+        text: str,
+        scanned: Optional[List[int]] = None,
+        pdf_bytes: Optional[bytes] = None
+    ) -> Dict[str, Any]:
+        document_type = template["document_type"]
+        self.update_job(
+            job_id, document_type=document_type, template=template["fingerprint"], progress=50
+        )
+        
+        fields = list(template["fields"])
+        if template["missing"]:
+            # Fields the template could not place may sit on the scanned pages
+            images = await self.scanned_page_images(job_id, pdf_bytes, scanned or [])
+            prompt = self.get_field_extraction_prompt(document_type, text, template["missing"])
+            if images:
+                prompt += self.get_scanned_pages_hint(sorted(images))
+            message = await self.create_message(
+                prompt, 4096, job_id=job_id, purpose="template_fallback", images=images
+            )
+            fallback = self.parse_extraction_response(message.content[0].text, document_type)
+            filled = {field["key"] for field in fields}
+            fields.extend(
+                field for field in fallback.get("fields", [])
+                if isinstance(field, dict) and field.get("key") not in filled
+            )
+        
+        self.update_job(job_id, progress=90)
+        result = {"document_type": document_type, "fields": fields}
+        if scanned:
+            result["scanned_pages"] = scanned
+        return result
+    
+    def create_job(
+        self,
+        pdf_bytes: bytes,
+        document_type: str,
+        bulk: bool = False,
+        user_id: Optional[int] = None,
+        weight: float = 1.0,
+        previous_job_id: Optional[str] = None,
+        daily_budget_usd: Optional[float] = None
+    ) -> str:
+        job_id = self.register_job(
+            document_type,
+            user_id,
+            content_hash(pdf_bytes),
+            pdf_bytes=pdf_bytes,
+            mode="bulk" if bulk else "interactive",
+            previous_job_id=previous_job_id,
+            daily_budget_usd=daily_budget_usd
+        )
+        
+        if bulk:
+            self.bulk_runner.enqueue(job_id, document_type)
+        else:
+            self.scheduler.submit(
+                job_id,
+                user_id,
+                lambda: self.process_pdf(job_id, pdf_bytes, document_type),
+                weight=weight
+            )
+        
+        return job_id
+    
+    def register_job(
+        self,
+        document_type: str,
+        user_id: Optional[int],
+        pdf_hash: str,
+        pdf_bytes: Optional[bytes] = None,
+        mode: str = "interactive",
+        **extra
+    ) -> str:
         import uuid
         job_id = str(uuid.uuid4())
         
@@ -214,14 +966,55 @@ Respond with ONLY one word: financial, legal, clinical, or general."""
             "status": JobStatus.PENDING,
             "document_type": document_type if document_type != DocumentType.AUTO else None,
             "progress": 0,
+            "version": 1,
             "created_at": datetime.utcnow().isoformat(),
-            "pdf_bytes": pdf_bytes
+            "pdf_bytes": pdf_bytes,
+            "content_hash": pdf_hash,
+            "mode": mode,
+            "user_id": user_id,
+            "profile": profiler.current() is not None or profiler.sampled(),
+            **extra
         }
-        
-        asyncio.create_task(self.process_pdf(job_id, pdf_bytes, document_type))
-        
+        self.retention.track(job_id)
+        self.retention.enforce()
         return job_id
     
+    def create_retyped_job(
+        self,
+        job_id: str,
+        document_type: str,
+        weight: float = 1.0,
+        daily_budget_usd: Optional[float] = None
+    ) -> str:
+        """Extract a finished job's document again as another type, reusing its parsed pages."""
+        source = self.jobs.get(job_id)
+        if source is None or source["status"] not in (JobStatus.COMPLETED, JobStatus.FAILED):
+            raise ValueError("Only finished jobs can be re-extracted")
+        if document_type == DocumentType.AUTO:
+            raise ValueError("A specific document type is required")
+        if source["status"] == JobStatus.COMPLETED and source.get("document_type") == document_type:
+            raise ValueError(f"Job was already extracted as {document_type}")
+        
+        user_id = source.get("user_id")
+        new_job_id = self.register_job(
+            document_type,
+            user_id,
+            source["content_hash"],
+            retyped_from=job_id,
+            daily_budget_usd=daily_budget_usd
+        )
+        self.scheduler.submit(
+            new_job_id,
+            user_id,
+            lambda: self.process_pdf(new_job_id, None, document_type),
+            weight=weight
+        )
+        return new_job_id
+    
+    def is_owner(self, job_id: str, user_id: Optional[int]) -> bool:
+        job = self.jobs.get(job_id)
+        return job is not None and job.get("user_id") == user_id
+    
     def get_job_status(self, job_id: str) -> Optional[Dict[str, Any]]:
         if job_id not in self.jobs:
             return None
@@ -232,9 +1025,47 @@ Respond with ONLY one word: financial, legal, clinical, or general."""
             "status": job["status"],
             "document_type": job.get("document_type"),
             "progress": job.get("progress", 0),
+            "version": job.get("version", 0),
+            "similar_jobs": job.get("similar_jobs"),
+            "queue_position": self.scheduler.queue_position(job_id),
             "error": job.get("error")
         }
     
+    async def wait_for_changes(
+        self, job_ids: List[str], known_versions: Dict[str, int], timeout: float
+    ) -> List[str]:
+        """Return the watched jobs whose version differs from the known one.
+        
+        Jobs without a known version are compared against their version at call
+        time. Blocks up to `timeout` seconds until at least one job changes, unless
+        every watched job has already reached a terminal state.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        baseline = {
+            job_id: known_versions.get(job_id, self.jobs[job_id].get("version", 0))
+            for job_id in job_ids
+            if job_id in self.jobs
+        }
+        
+        while True:
+            changed = [
+                job_id for job_id, version in baseline.items()
+                if job_id not in self.jobs or self.jobs[job_id].get("version", 0) != version
+            ]
+            if changed:
+                return changed
+            
+            active = [
+                job_id for job_id in baseline
+                if self.jobs[job_id]["status"] not in TERMINAL_STATUSES
+            ]
+            remaining = deadline - loop.time()
+            if not active or remaining <= 0:
+                return []
+            
+            await self.events.wait_any(active, remaining)
+    
     def get_job_result(self, job_id: str) -> Optional[Dict[str, Any]]:
         if job_id not in self.jobs:
             return None
@@ -248,7 +1079,7 @@ Respond with ONLY one word: financial, legal, clinical, or general."""
                 "error": job.get("error")
             }
         
-        result = job.get("result", {})
+        result = self.retention.load_result(job_id) or {}
         
         return {
             "job_id": job_id,
@@ -260,13 +1091,42 @@ Respond with ONLY one word: financial, legal, clinical, or general."""
             "error": None
         }
     
-    def get_all_completed_jobs(self) -> List[Dict[str, Any]]:
-        completed = []
-        for job_id, job in self.jobs.items():
-            if job["status"] == JobStatus.COMPLETED:
-                result = self.get_job_result(job_id)
-                if result:
-                    completed.append(result)
+    def completed_job_ids(
+        self,
+        user_id: Optional[int] = None,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        document_type: Optional[str] = None
+    ) -> List[str]:
+        """Ids of a user's completed jobs, oldest first, filtered by creation date (inclusive) and type."""
+        start_at = start.isoformat() if start else ""
+        end_before = (end + timedelta(days=1)).isoformat() if end else None
+        return [
+            job_id for job_id, job in list(self.jobs.items())
+            if job["status"] == JobStatus.COMPLETED
+            and job.get("user_id") == user_id
+            and job["created_at"] >= start_at
+            and (end_before is None or job["created_at"] < end_before)
+            and (document_type is None or job.get("document_type") == document_type)
+        ]
+    
+    def iter_job_results(self, job_ids: List[str]) -> Iterator[Dict[str, Any]]:
+        """Results of the given jobs one at a time, loading spilled results on demand."""
+        for job_id in job_ids:
+            result = self.get_job_result(job_id)
+            if result and result["status"] == JobStatus.COMPLETED:
+                yield result
+    
+    def get_all_completed_jobs(
+        self,
+        user_id: Optional[int] = None,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        document_type: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        completed = list(self.iter_job_results(
+            self.completed_job_ids(user_id, start, end, document_type)
+        ))
         
         completed.sort(key=lambda x: x["created_at"], reverse=True)
         return completed
@@ -0,0 +1,86 @@
+import json
+import re
+from datetime import date, datetime
+from typing import Any, Optional
+
+TEXT_VALUE_MAX_LENGTH = 1024
+
+DATE_FORMATS = [
+    "%Y-%m-%d",
+    "%m/%d/%Y",
+    "%m/%d/%y",
+    "%d.%m.%Y",
+    "%B %d, %Y",
+    "%b %d, %Y",
+    "%d %B %Y",
+    "%d %b %Y",
+    "%B %Y",
+    "%Y",
+]
+
+NUMBER_MULTIPLIERS = {
+    "k": 1e3,
+    "thousand": 1e3,
+    "m": 1e6,
+    "mm": 1e6,
+    "million": 1e6,
+    "b": 1e9,
+    "bn": 1e9,
+    "billion": 1e9,
+}
+
+_NUMBER_PATTERN = re.compile(r"^([+-]?\d+(?:\.\d+)?)\s*([a-z]*)$")
+
+
+def to_text(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, default=str)
+    return str(value)[:TEXT_VALUE_MAX_LENGTH]
+
+
+def to_number(value: Any) -> Optional[float]:
+    """Parse amounts such as 1500000, "$1,500,000.00", "(250)", "1.5M" or "12%"."""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, str):
+        return None
+
+    text = value.strip().lower()
+    negative = text.startswith("(") and text.endswith(")")
+    text = re.sub(r"[()$€£¥,%\s]|usd|eur|gbp", "", text)
+
+    match = _NUMBER_PATTERN.match(text)
+    if not match:
+        return None
+    number = float(match.group(1))
+    suffix = match.group(2)
+    if suffix:
+        if suffix not in NUMBER_MULTIPLIERS:
+            return None
+        number *= NUMBER_MULTIPLIERS[suffix]
+    return -number if negative else number
+
+
+def to_date(value: Any) -> Optional[date]:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if not isinstance(value, str):
+        return None
+
+    text = value.strip()
+    try:
+        return datetime.fromisoformat(text).date()
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
@@ -0,0 +1,106 @@
+import gzip
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import brotli
+from fastapi import Request, Response
+
+COMPRESSION_MIN_BYTES = 1024
+# Cached bodies live outside the job memory budget, so they are bounded by size
+ENCODED_BODY_CACHE_BYTES = 16 * 1024 * 1024
+ENCODED_BODY_MAX_BYTES = 1024 * 1024
+
+_encoded_bodies: "OrderedDict[Tuple[str, str], Tuple[str, bytes]]" = OrderedDict()
+_encoded_bytes = 0
+
+
+def make_etag(*parts: Any) -> str:
+    digest = hashlib.sha1(":".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest[:20]}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+def accepted_encodings(header: str) -> Dict[str, float]:
+    """Quality value per coding in an Accept-Encoding header."""
+    qualities = {}
+    for token in header.lower().split(","):
+        coding, *params = [part.strip() for part in token.split(";")]
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    return qualities
+
+
+def choose_encoding(request: Request) -> str:
+    """The supported coding the client weighs highest, preferring br on a tie."""
+    qualities = accepted_encodings(request.headers.get("accept-encoding", ""))
+    wildcard = qualities.get("*", 0.0)
+    best, best_quality = "identity", 0.0
+    for coding in ("br", "gzip"):
+        quality = qualities.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def json_response(request: Request, payload: Dict[str, Any], etag: str) -> Response:
+    """Serialize `payload` once per ETag and encoding, compressing large bodies.
+
+    Encoded bodies are cached by (etag, encoding), so repeated polls for an
+    unchanged job neither re-serialize nor re-compress. Bodies over
+    ENCODED_BODY_MAX_BYTES are not cached.
+    """
+    global _encoded_bytes
+    key = (etag, choose_encoding(request))
+    cached = _encoded_bodies.get(key)
+
+    if cached is None:
+        encoding = key[1]
+        body = json.dumps(payload, separators=(",", ":"), default=str).encode("utf-8")
+        if len(body) < COMPRESSION_MIN_BYTES:
+            encoding = "identity"
+        elif encoding == "br":
+            body = brotli.compress(body, quality=5)
+        elif encoding == "gzip":
+            body = gzip.compress(body, compresslevel=6)
+
+        if len(body) <= ENCODED_BODY_MAX_BYTES:
+            _encoded_bodies[key] = (encoding, body)
+            _encoded_bytes += len(body)
+            while _encoded_bytes > ENCODED_BODY_CACHE_BYTES:
+                _encoded_bytes -= len(_encoded_bodies.popitem(last=False)[1][1])
+    else:
+        encoding, body = cached
+        _encoded_bodies.move_to_end(key)
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def parse_projection(include: Optional[str]) -> Optional[set]:
+    if not include:
+        return None
+    return {key.strip() for key in include.split(",") if key.strip()}
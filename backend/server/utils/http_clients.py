@@ -0,0 +1,115 @@
+import logging
+from typing import Any, Dict
+
+import httpx
+
+from server.utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class HTTPClientRegistry:
+    """Application-lifetime pooled outbound HTTP clients, one per upstream service.
+
+    Clients keep connections alive (and negotiate HTTP/2 where the server offers
+    it) so repeated calls to the same host skip the TCP and TLS handshakes. Each
+    service has its own connection pool and timeouts.
+    """
+
+    def __init__(self):
+        self.clients: Dict[str, httpx.AsyncClient] = {}
+
+    def timeouts(self) -> Dict[str, float]:
+        return {
+            "google": settings.HTTP_GOOGLE_TIMEOUT_SECONDS,
+            "anthropic": settings.HTTP_ANTHROPIC_TIMEOUT_SECONDS,
+        }
+
+    def start(self):
+        for name in self.timeouts():
+            self.get(name)
+
+    async def close(self):
+        clients, self.clients = self.clients, {}
+        for name, client in clients.items():
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.error(f"Failed to close HTTP client {name}: {e}")
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        client = self.clients.get(name)
+        if client is None or client.is_closed:
+            client = self.clients[name] = self._create(name)
+        return client
+
+    def _create(self, name: str) -> httpx.AsyncClient:
+        transport = CountingTransport(httpx.AsyncHTTPTransport(
+            http2=settings.HTTP2_ENABLED,
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+        ))
+        return httpx.AsyncClient(
+            transport=transport,
+            timeout=httpx.Timeout(
+                self.timeouts().get(name, settings.HTTP_DEFAULT_TIMEOUT_SECONDS),
+                connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS,
+            ),
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            name: dict(client._transport.stats(), closed=client.is_closed)
+            for name, client in self.clients.items()
+        }
+
+
+class CountingTransport(httpx.AsyncBaseTransport):
+    """Wraps a pooled transport to count requests and report pool occupancy."""
+
+    def __init__(self, transport: httpx.AsyncHTTPTransport):
+        self.transport = transport
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        self.in_flight += 1
+        try:
+            return await self.transport.handle_async_request(request)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        pool = getattr(self.transport, "_pool", None)
+        connections = list(getattr(pool, "connections", None) or [])
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "connections": len(connections),
+            "idle_connections": sum(1 for connection in connections if connection.is_idle()),
+            "http2_connections": sum(
+                1 for connection in connections if _connection_info(connection).startswith("HTTP/2")
+            ),
+        }
+
+
+def _connection_info(connection) -> str:
+    try:
+        return connection.info()
+    except Exception:
+        return ""
+
+
+http_clients = HTTPClientRegistry()
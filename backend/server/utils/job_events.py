@@ -0,0 +1,44 @@
+import asyncio
+from typing import Dict, Iterable, Optional, Set
+
+
+class JobChangeNotifier:
+    """Wakes long-poll waiters when a watched job changes.
+
+    Each waiter is a single future registered under every job it watches; the
+    first `notify` for any of those jobs resolves it with that job id.
+    """
+
+    def __init__(self):
+        self._waiters: Dict[str, Set[asyncio.Future]] = {}
+
+    def notify(self, job_id: str):
+        for future in self._waiters.pop(job_id, ()):
+            if not future.done():
+                future.get_loop().call_soon_threadsafe(_resolve, future, job_id)
+
+    async def wait_any(self, job_ids: Iterable[str], timeout: float) -> Optional[str]:
+        job_ids = list(job_ids)
+        future = asyncio.get_running_loop().create_future()
+        for job_id in job_ids:
+            self._waiters.setdefault(job_id, set()).add(future)
+
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            for job_id in job_ids:
+                waiters = self._waiters.get(job_id)
+                if waiters is not None:
+                    waiters.discard(future)
+                    if not waiters:
+                        del self._waiters[job_id]
+
+    def waiter_count(self) -> int:
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+
+def _resolve(future: asyncio.Future, job_id: str):
+    if not future.done():
+        future.set_result(job_id)
@@ -0,0 +1,231 @@
+import asyncio
+import gzip
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, Optional
+
+from server.schemas.extraction import JobStatus
+from server.utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+JOB_OVERHEAD_BYTES = 512
+
+
+def write_spilled(path: str, result: Dict[str, Any]):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with gzip.open(path, "wt", encoding="utf-8", compresslevel=6) as f:
+        json.dump(result, f, separators=(",", ":"), default=str)
+
+
+class JobRetentionManager:
+    """Keeps the in-memory job table within a memory budget.
+
+    PDF bytes and page text are dropped as soon as a job finishes, finished jobs
+    expire after a per-state TTL, and completed results are spilled
+    least-recently-used first to gzipped JSON files once the budget is exceeded.
+    Spilled results are read back from disk on demand.
+
+    Spill files are written on a background thread and a result only leaves
+    memory once its file is complete. Reading one back blocks, so callers on
+    the event loop go through asyncio.to_thread. Expired jobs are swept at
+    most once per JOB_TTL_SWEEP_SECONDS.
+    """
+
+    def __init__(
+        self,
+        jobs: Dict[str, Dict[str, Any]],
+        budget_bytes: Optional[int] = None,
+        ttls: Optional[Dict[str, float]] = None,
+        spill_dir: Optional[str] = None,
+    ):
+        self.jobs = jobs
+        self.budget_bytes = (
+            budget_bytes if budget_bytes is not None
+            else settings.JOB_MEMORY_BUDGET_MB * 1024 * 1024
+        )
+        self.ttls = ttls if ttls is not None else {
+            JobStatus.COMPLETED: settings.JOB_COMPLETED_TTL_SECONDS,
+            JobStatus.FAILED: settings.JOB_FAILED_TTL_SECONDS,
+            JobStatus.CANCELLED: settings.JOB_FAILED_TTL_SECONDS,
+        }
+        self.spill_dir = spill_dir or settings.JOB_SPILL_DIR or os.path.join(
+            tempfile.gettempdir(), "zoku-job-spill"
+        )
+        self.sizes: "OrderedDict[str, int]" = OrderedDict()
+        self.touched_at: Dict[str, float] = {}
+        self.memory_bytes = 0
+        self.spilled = 0
+        self.evicted = 0
+        self.swept_at = time.monotonic()
+        # Jobs whose result is being written to disk
+        self.spilling: Dict[str, int] = {}
+        self.io_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-spill")
+
+    def track(self, job_id: str):
+        """Recompute the footprint of a job after its entry changed."""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        size = JOB_OVERHEAD_BYTES + len(job.get("pdf_bytes") or b"")
+        size += sum(len(page) for page in job.get("pages") or [])
+        if job.get("result") is not None:
+            size += len(json.dumps(job["result"], separators=(",", ":"), default=str))
+
+        self.memory_bytes += size - self.sizes.get(job_id, 0)
+        self.sizes[job_id] = size
+        self.sizes.move_to_end(job_id)
+        self.touched_at[job_id] = time.monotonic()
+
+    def on_job_finished(self, job_id: str):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        job.pop("pdf_bytes", None)
+        job.pop("pages", None)
+        self.track(job_id)
+        self.enforce()
+
+    def load_result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """A job's result from memory or its spill file; reading it counts as a touch."""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        if job_id in self.sizes:
+            self.touched_at[job_id] = time.monotonic()
+        # Spilling sets result_path before clearing result, so one of them is always set
+        result = job.get("result")
+        if result is not None:
+            if job_id in self.sizes:
+                self.sizes.move_to_end(job_id)
+            return result
+
+        path = job.get("result_path")
+        if not path:
+            return None
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                return json.load(f)
+        except OSError as e:
+            # The file is removed once a replacement result is in memory
+            if job.get("result") is not None:
+                return job["result"]
+            logger.error(f"Failed to load spilled result for job {job_id}: {e}")
+            return None
+
+    def replace_result(self, job_id: str, result: Dict[str, Any]):
+        """Swap in an updated result, dropping any spilled copy of the old one."""
+        job = self.jobs[job_id]
+        job["result"] = result
+        path = job.pop("result_path", None)
+        if path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.track(job_id)
+        self.enforce()
+
+    def enforce(self):
+        now = time.monotonic()
+        if now - self.swept_at >= settings.JOB_TTL_SWEEP_SECONDS:
+            self.swept_at = now
+            self.sweep(now)
+
+        # Results already being written count as released
+        if self.memory_bytes - sum(self.spilling.values()) <= self.budget_bytes:
+            return
+
+        for job_id in list(self.sizes):
+            if self.memory_bytes - sum(self.spilling.values()) <= self.budget_bytes:
+                return
+            job = self.jobs[job_id]
+            if (
+                job["status"] == JobStatus.COMPLETED
+                and job.get("result") is not None
+                and job_id not in self.spilling
+            ):
+                self._spill(job_id)
+
+        if self.memory_bytes - sum(self.spilling.values()) > self.budget_bytes:
+            logger.warning(
+                f"Job memory {self.memory_bytes} bytes exceeds budget of "
+                f"{self.budget_bytes} bytes after spilling all completed results"
+            )
+
+    def sweep(self, now: float):
+        """Evict finished jobs that were not touched within their state's TTL."""
+        for job_id in list(self.sizes):
+            job = self.jobs.get(job_id)
+            if job is None:
+                self._forget(job_id)
+                continue
+            ttl = self.ttls.get(job["status"])
+            if ttl and now - self.touched_at.get(job_id, now) > ttl:
+                self.evict(job_id)
+
+    def evict(self, job_id: str):
+        job = self.jobs.pop(job_id, None)
+        if job and job.get("result_path"):
+            try:
+                os.remove(job["result_path"])
+            except OSError:
+                pass
+        self._forget(job_id)
+        self.evicted += 1
+
+    def memory_usage(self) -> Dict[str, Any]:
+        return {
+            "memory_bytes": self.memory_bytes,
+            "budget_bytes": self.budget_bytes,
+            "jobs_in_memory": len(self.jobs),
+            "spilled_results": sum(1 for job in self.jobs.values() if job.get("result_path")),
+            "spilled_total": self.spilled,
+            "evicted_total": self.evicted,
+        }
+
+    def _spill(self, job_id: str):
+        result = self.jobs[job_id]["result"]
+        path = os.path.join(self.spill_dir, f"{job_id}.json.gz")
+        self.spilling[job_id] = self.sizes.get(job_id, 0)
+        future = self.io_executor.submit(write_spilled, path, result)
+        try:
+            asyncio.wrap_future(future, loop=asyncio.get_running_loop()).add_done_callback(
+                lambda done: self._spilled(job_id, path, result, done)
+            )
+        except RuntimeError:
+            # No event loop to come back to, so wait for the write here
+            self._spilled(job_id, path, result, future)
+
+    def _spilled(self, job_id: str, path: str, result: Dict[str, Any], done: Future):
+        self.spilling.pop(job_id, None)
+        error = done.exception()
+        if error is not None:
+            logger.error(f"Failed to spill result for job {job_id}: {error}")
+            return
+        job = self.jobs.get(job_id)
+        if job is None or job.get("result") is not result:
+            # Evicted or re-extracted while the file was written
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return
+
+        job["result_path"] = path
+        job["result"] = None
+        self.spilled += 1
+        touched_at = self.touched_at.get(job_id)
+        self.track(job_id)
+        if touched_at is not None:
+            self.touched_at[job_id] = touched_at
+
+    def _forget(self, job_id: str):
+        self.memory_bytes -= self.sizes.pop(job_id, 0)
+        self.spilling.pop(job_id, None)
+        self.touched_at.pop(job_id, None)
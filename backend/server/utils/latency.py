@@ -0,0 +1,180 @@
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from server.utils.config import settings
+
+# Rough input tokens per attached page image
+IMAGE_INPUT_TOKENS = 1600
+
+# (model, max_tokens, input size bucket)
+LatencyKey = Tuple[str, int, int]
+
+
+def input_size_bucket(prompt: str, images: int = 0) -> int:
+    """Estimated input tokens rounded up to a power of two, at least 1024."""
+    tokens = len(prompt) // 4 + images * IMAGE_INPUT_TOKENS
+    return 1 << max(10, math.ceil(math.log2(max(tokens, 1))))
+
+
+def percentile(samples, q: float) -> float:
+    ordered = sorted(samples)
+    index = max(0, math.ceil(q / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+class LatencyTracker:
+    """Rolling model latencies driving adaptive timeouts and request hedging.
+
+    Samples are kept per (model, max_tokens, input size bucket) since a one-word
+    classification and a full extraction, or a one-page and a 300-page document,
+    have very different latency profiles. Until a key has
+    LLM_LATENCY_MIN_SAMPLES samples it gets the maximum timeout and no hedging.
+    Hedges are paid for with credits: every primary request earns
+    LLM_HEDGE_MAX_RATIO of a credit and a hedge spends a whole one, so hedges
+    never exceed that share of traffic.
+    """
+
+    def __init__(self):
+        self.samples: Dict[LatencyKey, Deque[float]] = {}
+        self.lock = threading.Lock()
+        self.hedge_credits = 1.0
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.timeouts = 0
+
+    def record(self, key: LatencyKey, seconds: float):
+        with self.lock:
+            window = self.samples.get(key)
+            if window is None:
+                window = self.samples[key] = deque(maxlen=settings.LLM_LATENCY_WINDOW)
+            window.append(seconds)
+
+    def record_timeout(self, key: LatencyKey, seconds: float):
+        """Count a timeout as a sample at the limit so the percentiles drift upwards."""
+        self.record(key, seconds)
+        with self.lock:
+            self.timeouts += 1
+
+    def percentile(self, key: LatencyKey, q: float) -> Optional[float]:
+        with self.lock:
+            window = self.samples.get(key)
+            if not window or len(window) < settings.LLM_LATENCY_MIN_SAMPLES:
+                return None
+            return percentile(window, q)
+
+    def timeout(self, key: LatencyKey) -> float:
+        p99 = self.percentile(key, 99)
+        if p99 is None:
+            return settings.LLM_TIMEOUT_MAX_SECONDS
+        return min(
+            settings.LLM_TIMEOUT_MAX_SECONDS,
+            max(settings.LLM_TIMEOUT_MIN_SECONDS, p99 * settings.LLM_TIMEOUT_MULTIPLIER),
+        )
+
+    def hedge_delay(self, key: LatencyKey) -> Optional[float]:
+        if not settings.LLM_HEDGING_ENABLED:
+            return None
+        return self.percentile(key, 95)
+
+    def start_request(self):
+        with self.lock:
+            self.requests += 1
+            self.hedge_credits = min(
+                settings.LLM_HEDGE_MAX_BURST, self.hedge_credits + settings.LLM_HEDGE_MAX_RATIO
+            )
+
+    def try_hedge(self) -> bool:
+        with self.lock:
+            if self.hedge_credits < 1:
+                return False
+            self.hedge_credits -= 1
+            self.hedged += 1
+            return True
+
+    def record_hedge_win(self):
+        with self.lock:
+            self.hedge_wins += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            windows = {key: list(window) for key, window in self.samples.items()}
+            summary = {
+                "hedging_enabled": settings.LLM_HEDGING_ENABLED,
+                "requests": self.requests,
+                "hedged": self.hedged,
+                "hedge_rate": self.hedged / self.requests if self.requests else 0.0,
+                "hedge_wins": self.hedge_wins,
+                "timeouts": self.timeouts,
+            }
+
+        summary["models"] = [
+            {
+                "model": model,
+                "max_tokens": max_tokens,
+                "input_tokens_up_to": input_bucket,
+                "samples": len(window),
+                "p50": percentile(window, 50),
+                "p95": percentile(window, 95),
+                "p99": percentile(window, 99),
+                "timeout": self.timeout((model, max_tokens, input_bucket)),
+            }
+            for (model, max_tokens, input_bucket), window in windows.items() if window
+        ]
+        return summary
+
+    async def call(
+        self, key: LatencyKey, request: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Run `request` under the adaptive timeout, hedging it after the p95 delay.
+
+        The first attempt to succeed wins and the other is cancelled, which closes
+        its HTTP request. Raises asyncio.TimeoutError when nothing answers in time.
+        """
+        self.start_request()
+        timeout = self.timeout(key)
+        hedge_delay = self.hedge_delay(key)
+        started = time.monotonic()
+        deadline = started + timeout
+
+        attempts = {asyncio.ensure_future(request())}
+        primary = next(iter(attempts))
+        hedge_pending = hedge_delay is not None and hedge_delay < timeout
+        last_error: Optional[BaseException] = None
+
+        try:
+            while attempts:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                wait = min(remaining, hedge_delay - (time.monotonic() - started)) if hedge_pending else remaining
+                done, attempts = await asyncio.wait(
+                    attempts, timeout=max(0.0, wait), return_when=asyncio.FIRST_COMPLETED
+                )
+
+                for attempt in done:
+                    if attempt.exception() is None:
+                        self.record(key, time.monotonic() - started)
+                        if attempt is not primary:
+                            self.record_hedge_win()
+                        return attempt.result()
+                    last_error = attempt.exception()
+
+                if hedge_pending and time.monotonic() - started >= hedge_delay:
+                    hedge_pending = False
+                    if attempts and self.try_hedge():
+                        attempts.add(asyncio.ensure_future(request()))
+                elif not done and not hedge_pending:
+                    break
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+
+        if last_error is not None and not attempts:
+            raise last_error
+        self.record_timeout(key, timeout)
+        raise asyncio.TimeoutError(f"{key[0]} did not respond within {timeout:.1f}s")
@@ -0,0 +1,272 @@
+import hashlib
+import re
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+from server.utils.config import settings
+from server.utils.field_values import to_date, to_number
+
+FINGERPRINT_LINES = 6
+MAX_TEXT_VALUE_LENGTH = 200
+
+_DIGITS = re.compile(r"\d+")
+_SPACES = re.compile(r"\s+")
+
+
+def _normalize(line: str) -> str:
+    return _SPACES.sub(" ", _DIGITS.sub("0", line.lower())).strip()
+
+
+def _pattern(normalized: str) -> str:
+    """Regex matching any raw line that normalizes to `normalized`."""
+    return "".join(
+        r"\d+" if char == "0" else r"\s+" if char == " " else re.escape(char)
+        for char in normalized
+    )
+
+
+def layout_fingerprint(pages: List[str]) -> Optional[str]:
+    """Hash the leading lines of the first page with digits collapsed.
+
+    Documents from the same issuer share headers and labels, so their leading
+    lines normalize to the same text even when numbers and dates differ.
+    """
+    if not pages:
+        return None
+    lines = [line for line in (_normalize(raw) for raw in pages[0].splitlines()) if line]
+    if len(lines) < 3:
+        return None
+    header = "\n".join(lines[:FINGERPRINT_LINES])
+    return hashlib.sha1(header.encode("utf-8")).hexdigest()[:16]
+
+
+def _locate(pages: List[str], source_text: str, page_hint: Optional[int]) -> Optional[Dict[str, Any]]:
+    """Describe where `source_text` sits as an anchor relative to nearby label text."""
+    order = list(range(len(pages)))
+    if page_hint and 1 <= page_hint <= len(pages):
+        order.remove(page_hint - 1)
+        order.insert(0, page_hint - 1)
+
+    for index in order:
+        lines = pages[index].splitlines()
+        for line_number, line in enumerate(lines):
+            position = line.find(source_text)
+            if position < 0:
+                continue
+
+            prefix = _normalize(line[:position])
+            suffix = _normalize(line[position + len(source_text):])
+            if len(prefix) >= 2:
+                return {"page": index + 1, "mode": "inline", "anchor": prefix, "suffix": suffix}
+
+            previous = next(
+                (_normalize(raw) for raw in reversed(lines[:line_number]) if raw.strip()), ""
+            )
+            if len(previous) >= 2 and not suffix:
+                return {"page": index + 1, "mode": "below", "anchor": previous, "suffix": ""}
+            return None
+    return None
+
+
+def _find_value(pages: List[str], spec: Dict[str, Any]) -> Optional[Tuple[str, int]]:
+    if spec["page"] > len(pages):
+        return None
+    lines = pages[spec["page"] - 1].splitlines()
+    anchor = re.compile(r"^\s*" + _pattern(spec["anchor"]), re.IGNORECASE)
+
+    for line_number, line in enumerate(lines):
+        match = anchor.match(line)
+        if not match:
+            continue
+
+        if spec["mode"] == "inline":
+            value = line[match.end():]
+            if spec["suffix"]:
+                suffix = re.search(r"\s*" + _pattern(spec["suffix"]) + r"\s*$", value, re.IGNORECASE)
+                if not suffix:
+                    continue
+                value = value[:suffix.start()]
+        else:
+            if line[match.end():].strip():
+                continue
+            value = next((raw for raw in lines[line_number + 1:] if raw.strip()), "")
+
+        value = value.strip()
+        if value:
+            return value, spec["page"]
+    return None
+
+
+def _typed_value(raw: str, field_type: str):
+    if field_type == "number":
+        return to_number(raw)
+    if field_type == "date":
+        parsed = to_date(raw)
+        return parsed.isoformat() if parsed else None
+    return raw if len(raw) <= MAX_TEXT_VALUE_LENGTH else None
+
+
+class LayoutTemplateStore:
+    """Learns per-layout field anchors from completed LLM extractions.
+
+    For every account and layout fingerprint it keeps, per field key, the
+    candidate anchors (label text before the value, or the line above it) that
+    earlier documents agreed on; one account's documents never fill another's.
+    A field's confidence is the share of observations backing its best anchor,
+    scaled down until the layout has been seen TEMPLATE_MIN_SUPPORT times.
+    """
+
+    def __init__(self):
+        self.templates: Dict[Tuple[Any, str], Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+        self.applied = 0
+        self.fully_filled = 0
+        self.fields_filled = 0
+        self.fields_deferred = 0
+
+    def learn(
+        self,
+        pages: List[str],
+        document_type: Optional[str],
+        fields: List[Dict[str, Any]],
+        user_id: Any = None,
+    ):
+        fingerprint = layout_fingerprint(pages)
+        if fingerprint is None or not document_type:
+            return
+
+        observed = {}
+        unanchored = {}
+        for field in fields:
+            if not isinstance(field, dict) or not field.get("key") or field["key"] == "raw_extraction":
+                continue
+            if field.get("extracted_by") == "template":
+                continue
+            source_text = field.get("source_text")
+            location = field.get("location") if isinstance(field.get("location"), dict) else {}
+            spec = None
+            if isinstance(source_text, str) and source_text.strip():
+                spec = _locate(pages, source_text.strip(), location.get("page"))
+            if spec is None:
+                unanchored[field["key"]] = {
+                    "key": field["key"],
+                    "label": field.get("label"),
+                    "field_type": field.get("field_type") or "text",
+                }
+                continue
+            spec.update({
+                "label": field.get("label"),
+                "field_type": field.get("field_type") or "text",
+                "region": location.get("region"),
+            })
+            observed[field["key"]] = spec
+
+        if not observed and not unanchored:
+            return
+
+        with self.lock:
+            template = self.templates.setdefault((user_id, fingerprint), {
+                "fingerprint": fingerprint,
+                "user_id": user_id,
+                "document_type": document_type,
+                "observations": 0,
+                "fields": {},
+                "unanchored": {},
+            })
+            if template["document_type"] != document_type:
+                return
+            template["observations"] += 1
+            for key, spec in observed.items():
+                anchor_key = f"{spec['page']}|{spec['mode']}|{spec['anchor']}|{spec['suffix']}"
+                candidates = template["fields"].setdefault(key, {})
+                candidate = candidates.setdefault(anchor_key, dict(spec, count=0))
+                candidate["count"] += 1
+            for key, spec in unanchored.items():
+                if key not in template["fields"]:
+                    template["unanchored"][key] = spec
+
+    def matches(self, pages: List[str], user_id: Any = None) -> bool:
+        """Whether the account has a template for the layout; only the first page is needed."""
+        fingerprint = layout_fingerprint(pages[:1])
+        with self.lock:
+            return fingerprint is not None and (user_id, fingerprint) in self.templates
+
+    def apply(self, pages: List[str], user_id: Any = None) -> Optional[Dict[str, Any]]:
+        """Fill fields from a matching template.
+
+        Returns the template's document type, the confidently filled fields and the
+        field specs (key/label/field_type) the template could not fill, or None when
+        no template matches the layout or it fills nothing.
+        """
+        fingerprint = layout_fingerprint(pages)
+        with self.lock:
+            template = self.templates.get((user_id, fingerprint)) if fingerprint else None
+            if template is None:
+                return None
+            observations = template["observations"]
+            field_candidates = {
+                key: max(candidates.values(), key=lambda c: c["count"])
+                for key, candidates in template["fields"].items()
+            }
+            document_type = template["document_type"]
+            unanchored = [
+                spec for key, spec in template["unanchored"].items() if key not in field_candidates
+            ]
+
+        support = min(1.0, observations / max(1, settings.TEMPLATE_MIN_SUPPORT))
+        filled = []
+        missing = list(unanchored)
+        for key, spec in field_candidates.items():
+            confidence = round(spec["count"] / observations * support, 3)
+            found = _find_value(pages, spec) if confidence >= settings.TEMPLATE_MIN_CONFIDENCE else None
+            value = _typed_value(found[0], spec["field_type"]) if found else None
+            if value is None:
+                missing.append({"key": key, "label": spec["label"], "field_type": spec["field_type"]})
+                continue
+            filled.append({
+                "key": key,
+                "value": value,
+                "source_text": found[0],
+                "confidence": confidence,
+                "field_type": spec["field_type"],
+                "label": spec["label"],
+                "location": {"page": found[1], "region": spec["region"] or "middle"},
+                "extracted_by": "template",
+            })
+
+        if not filled:
+            return None
+
+        with self.lock:
+            self.applied += 1
+            self.fields_filled += len(filled)
+            self.fields_deferred += len(missing)
+            if not missing:
+                self.fully_filled += 1
+
+        return {
+            "fingerprint": fingerprint,
+            "document_type": document_type,
+            "fields": filled,
+            "missing": missing,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "templates": len(self.templates),
+                "applied": self.applied,
+                "fully_filled": self.fully_filled,
+                "fields_filled": self.fields_filled,
+                "fields_deferred_to_llm": self.fields_deferred,
+                "layouts": [
+                    {
+                        "fingerprint": template["fingerprint"],
+                        "user_id": template["user_id"],
+                        "document_type": template["document_type"],
+                        "observations": template["observations"],
+                        "fields": sorted(template["fields"]),
+                    }
+                    for template in self.templates.values()
+                ],
+            }
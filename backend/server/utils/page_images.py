@@ -0,0 +1,143 @@
+import asyncio
+import io
+import logging
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+
+from server.utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Larger images are resized by the API before the model sees them
+MAX_IMAGE_PIXELS = 1_150_000
+
+
+def is_scanned_page(text: Optional[str]) -> bool:
+    return len((text or "").strip()) < settings.SCANNED_PAGE_MIN_CHARS
+
+
+def scanned_page_numbers(pages: List[str]) -> List[int]:
+    """1-indexed numbers of the pages without a usable text layer."""
+    return [number for number, page in enumerate(pages, start=1) if is_scanned_page(page)]
+
+
+def render_pages(pdf_bytes: bytes, page_numbers: List[int], max_px: int, quality: int) -> Dict[int, bytes]:
+    """Render pages to JPEG, scaled down to at most `max_px` on the long side.
+
+    Runs in a worker process: pdfium is not thread-safe.
+    """
+    import pypdfium2 as pdfium
+
+    document = pdfium.PdfDocument(pdf_bytes)
+    try:
+        images = {}
+        for number in page_numbers:
+            if not 1 <= number <= len(document):
+                continue
+            page = document[number - 1]
+            try:
+                width, height = page.get_size()
+                scale = min(max_px / max(width, height), (MAX_IMAGE_PIXELS / (width * height)) ** 0.5)
+                image = page.render(scale=scale).to_pil()
+                buffer = io.BytesIO()
+                image.save(buffer, format="JPEG", quality=quality, optimize=True)
+                images[number] = buffer.getvalue()
+            finally:
+                page.close()
+        return images
+    finally:
+        document.close()
+
+
+class PageImageRenderer:
+    """Renders scanned pages to images in a process pool, caching them by content.
+
+    Images are keyed by the PDF's content hash and page number, so retries,
+    re-extractions and identical uploads reuse pages rendered before. A job's
+    pages are split across SCANNED_PAGE_RENDER_WORKERS processes.
+    """
+
+    def __init__(self, max_cached: Optional[int] = None):
+        self.max_cached = max_cached if max_cached is not None else settings.SCANNED_PAGE_CACHE_SIZE
+        self.cache: "OrderedDict[Tuple[str, int], bytes]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.rendered = 0
+        self.hits = 0
+        self.failures = 0
+        self.render_seconds = 0.0
+
+    async def render(
+        self, key: str, pdf_bytes: Optional[bytes], page_numbers: List[int]
+    ) -> Dict[int, bytes]:
+        """Images of the given pages; pages that cannot be rendered are left out."""
+        images = {}
+        with self.lock:
+            for number in page_numbers:
+                image = self.cache.get((key, number))
+                if image is not None:
+                    self.cache.move_to_end((key, number))
+                    images[number] = image
+            self.hits += len(images)
+
+        missing = [number for number in page_numbers if number not in images]
+        if not missing or pdf_bytes is None:
+            return images
+
+        workers = max(1, settings.SCANNED_PAGE_RENDER_WORKERS)
+        chunks = [missing[i::workers] for i in range(min(workers, len(missing)))]
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        outcomes = await asyncio.gather(*(
+            loop.run_in_executor(
+                self._executor(),
+                render_pages,
+                pdf_bytes,
+                chunk,
+                settings.SCANNED_PAGE_MAX_PX,
+                settings.SCANNED_PAGE_JPEG_QUALITY,
+            )
+            for chunk in chunks
+        ), return_exceptions=True)
+
+        with self.lock:
+            self.render_seconds += time.monotonic() - started
+            for outcome in outcomes:
+                if isinstance(outcome, BaseException):
+                    if isinstance(outcome, BrokenProcessPool):
+                        self.executor = None
+                    self.failures += 1
+                    logger.warning(f"Failed to render scanned pages of {key}: {outcome}")
+                    continue
+                for number, image in outcome.items():
+                    images[number] = image
+                    self.cache[(key, number)] = image
+                    self.rendered += 1
+            while len(self.cache) > self.max_cached:
+                self.cache.popitem(last=False)
+        return images
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "pages_rendered": self.rendered,
+                "cache_hits": self.hits,
+                "render_failures": self.failures,
+                "render_seconds": round(self.render_seconds, 3),
+                "cached_pages": len(self.cache),
+                "cached_bytes": sum(len(image) for image in self.cache.values()),
+                "max_cached": self.max_cached,
+            }
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                max_workers=max(1, settings.SCANNED_PAGE_RENDER_WORKERS),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self.executor
@@ -0,0 +1,45 @@
+import asyncio
+from typing import List, Optional
+
+
+class PageStream:
+    """Pages of a PDF as the parser produces them.
+
+    The parser pushes pages from its worker thread; coroutines on the event loop
+    can start on the leading text while later pages are still being parsed.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.pages: List[str] = []
+        self.chars = 0
+        self.done = False
+        self.changed = asyncio.Event()
+
+    def push(self, page: str):
+        """Add the next page; safe to call from any thread."""
+        self.loop.call_soon_threadsafe(self._append, page)
+
+    def _append(self, page: str):
+        if self.done:
+            return
+        self.pages.append(page)
+        self.chars += len(page) + 1
+        self.changed.set()
+
+    def finish(self):
+        self.done = True
+        self.changed.set()
+
+    async def leading_text(self, min_chars: int) -> Optional[str]:
+        """Text of the pages parsed so far once it reaches `min_chars` or parsing ends.
+
+        Returns None when the stream finished without any page being pushed, i.e.
+        the pages came from somewhere other than a live parse.
+        """
+        while not self.done and self.chars < min_chars:
+            self.changed.clear()
+            await self.changed.wait()
+        if not self.pages:
+            return None
+        return "".join(page + "\n" for page in self.pages)
@@ -0,0 +1,88 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from server import crud
+from server.utils.config import settings
+from server.utils.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(pdf_bytes: bytes) -> str:
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+class ParseArtifactStore:
+    """Parsed page text shared by every job whose PDF has the same content hash.
+
+    Artifacts are persisted in the parse_artifacts table and the most recently
+    used ones are kept in memory, so re-extracting a document (or extracting an
+    identical upload) never runs the PDF parser again. Rows are written on
+    `executor`, so storing an artifact never holds up the extraction.
+    """
+
+    def __init__(self, executor, max_cached: Optional[int] = None):
+        self.executor = executor
+        self.max_cached = max_cached if max_cached is not None else settings.PARSE_ARTIFACT_CACHE_SIZE
+        self.cache: "OrderedDict[str, List[str]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[List[str]]:
+        with self.lock:
+            pages = self.cache.get(key)
+            if pages is not None:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return pages
+
+        db = SessionLocal()
+        try:
+            pages = crud.parse_artifact.get(db, key)
+        except Exception as e:
+            logger.error(f"Failed to load parse artifact {key}: {e}")
+            pages = None
+        finally:
+            db.close()
+
+        with self.lock:
+            if pages is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._cache(key, pages)
+        return pages
+
+    def put(self, key: str, pages: List[str]):
+        with self.lock:
+            self._cache(key, pages)
+        self.executor.submit(self._write, key, pages)
+
+    def _write(self, key: str, pages: List[str]):
+        db = SessionLocal()
+        try:
+            crud.parse_artifact.save(db, key, pages)
+        except Exception as e:
+            logger.error(f"Failed to store parse artifact {key}: {e}")
+        finally:
+            db.close()
+
+    def _cache(self, key: str, pages: List[str]):
+        self.cache[key] = pages
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.max_cached:
+            self.cache.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "cached": len(self.cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
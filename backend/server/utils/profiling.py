@@ -0,0 +1,229 @@
+import contextlib
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from server.utils.config import settings
+
+# Innermost frames of threads that are only waiting for work
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),
+    ("queue.py", "get"),
+}
+
+_current_profile: ContextVar[Optional["Profile"]] = ContextVar("current_profile", default=None)
+_current_span: ContextVar[Optional[int]] = ContextVar("current_span", default=None)
+
+
+class Profile:
+    """CPU samples and wall-clock spans captured for one request or job."""
+
+    def __init__(self, kind: str, name: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.name = name
+        self.created_at = datetime.utcnow().isoformat()
+        self.started = time.perf_counter()
+        self.ended: Optional[float] = None
+        self.frames: Dict[Tuple[str, str, int], int] = {}
+        self.samples: Dict[str, List[Tuple[float, Tuple[int, ...]]]] = {}  # (weight ms, stack)
+        self.sample_count = 0
+        self.spans: List[Dict[str, Any]] = []
+        self._span_ids = itertools.count()
+
+    def add_sample(self, thread_name: str, stack: List[Tuple[str, str, int]], weight_ms: float):
+        if self.ended is not None or self.sample_count >= settings.PROFILE_MAX_SAMPLES:
+            return
+        indices = tuple(self.frames.setdefault(frame, len(self.frames)) for frame in stack)
+        self.samples.setdefault(thread_name, []).append((weight_ms, indices))
+        self.sample_count += 1
+
+    def open_span(self, name: str, parent: Optional[int], attributes: Dict[str, Any]) -> int:
+        span_id = next(self._span_ids)
+        self.spans.append({
+            "id": span_id,
+            "parent": parent,
+            "name": name,
+            "start_ms": (time.perf_counter() - self.started) * 1000,
+            "end_ms": None,
+            "attributes": attributes,
+        })
+        return span_id
+
+    def close_span(self, span_id: int):
+        self.spans[span_id]["end_ms"] = (time.perf_counter() - self.started) * 1000
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.ended or time.perf_counter()) - self.started) * 1000
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "profile_id": self.id,
+            "kind": self.kind,
+            "name": self.name,
+            "created_at": self.created_at,
+            "duration_ms": round(self.duration_ms, 3),
+            "samples": self.sample_count,
+        }
+
+    def span_tree(self) -> List[Dict[str, Any]]:
+        nodes = {span["id"]: dict(span, children=[]) for span in self.spans}
+        roots = []
+        for node in nodes.values():
+            parent = nodes.get(node.pop("parent"))
+            (parent["children"] if parent else roots).append(node)
+            node.pop("id")
+        return roots
+
+    def to_speedscope(self) -> Dict[str, Any]:
+        """Export the samples as a speedscope file, one sampled profile per thread."""
+        frames = [None] * len(self.frames)
+        for (name, file, line), index in self.frames.items():
+            frames[index] = {"name": name, "file": file, "line": line}
+
+        profiles = []
+        for thread_name, samples in self.samples.items():
+            profiles.append({
+                "type": "sampled",
+                "name": thread_name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": sum(weight for weight, _ in samples),
+                "samples": [list(stack) for _, stack in samples],
+                "weights": [weight for weight, _ in samples],
+            })
+
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"{self.kind} {self.name}",
+            "exporter": "zoku",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": profiles,
+        }
+
+
+class SamplingProfiler:
+    """Opt-in sampling profiler for individual requests and extraction jobs.
+
+    A daemon thread snapshots every thread's stack each PROFILE_INTERVAL_MS while
+    at least one profile is active and exits when none is, so nothing runs when
+    profiling is off. Samples cover the whole process, which on the shared event
+    loop includes concurrent requests; the span tree is exact per profile.
+    Finished profiles are kept newest first, up to PROFILE_MAX_STORED.
+    """
+
+    def __init__(self):
+        self.active: Dict[str, Profile] = {}
+        self.stored: "OrderedDict[str, Profile]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+
+    def sampled(self) -> bool:
+        return settings.PROFILE_SAMPLE_RATE > 0 and random.random() < settings.PROFILE_SAMPLE_RATE
+
+    def current(self) -> Optional[Profile]:
+        return _current_profile.get()
+
+    @contextlib.contextmanager
+    def profile(self, kind: str, name: str):
+        profile = Profile(kind, name)
+        token = _current_profile.set(profile)
+        span_token = _current_span.set(None)
+        with self.lock:
+            self.active[profile.id] = profile
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._sample, name="profiler", daemon=True)
+                self.thread.start()
+        try:
+            yield profile
+        finally:
+            profile.ended = time.perf_counter()
+            _current_span.reset(span_token)
+            _current_profile.reset(token)
+            with self.lock:
+                self.active.pop(profile.id, None)
+                self.stored[profile.id] = profile
+                while len(self.stored) > settings.PROFILE_MAX_STORED:
+                    self.stored.popitem(last=False)
+
+    @contextlib.contextmanager
+    def detached(self):
+        """Run outside the caller's profile, e.g. work scheduled from a profiled request."""
+        token = _current_profile.set(None)
+        span_token = _current_span.set(None)
+        try:
+            yield
+        finally:
+            _current_span.reset(span_token)
+            _current_profile.reset(token)
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attributes):
+        """Record a wall-clock span in the current profile; a no-op when none is active."""
+        profile = _current_profile.get()
+        if profile is None:
+            yield
+            return
+        span_id = profile.open_span(name, _current_span.get(), attributes)
+        token = _current_span.set(span_id)
+        try:
+            yield
+        finally:
+            _current_span.reset(token)
+            profile.close_span(span_id)
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        with self.lock:
+            return self.stored.get(profile_id)
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self.lock:
+            return [profile.summary() for profile in reversed(self.stored.values())]
+
+    def _sample(self):
+        own_id = threading.get_ident()
+        interval = settings.PROFILE_INTERVAL_MS / 1000
+        previous = time.perf_counter()
+        while True:
+            with self.lock:
+                profiles = list(self.active.values())
+                if not profiles:
+                    self.thread = None
+                    return
+
+            # Each stack stands for the time since the previous snapshot, which
+            # can exceed the interval when the GIL is busy
+            now = time.perf_counter()
+            weight_ms, previous = (now - previous) * 1000, now
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+                if not stack or (os.path.basename(stack[0][1]), stack[0][0]) in _IDLE_LEAVES:
+                    continue
+                stack.reverse()
+                thread_name = names.get(thread_id, str(thread_id))
+                for profile in profiles:
+                    profile.add_sample(thread_name, stack, weight_ms)
+
+            time.sleep(interval)
+
+
+profiler = SamplingProfiler()
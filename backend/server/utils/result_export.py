@@ -0,0 +1,163 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List
+
+from server.utils.config import settings
+from server.utils.field_values import to_number
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+BASE_COLUMNS = ["job_id", "document_type", "created_at"]
+
+# Returns a fresh iterator over the job results each time it is called
+Results = Callable[[], Iterable[Dict[str, Any]]]
+
+
+def field_text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(",", ":"), default=str)
+    return str(value)
+
+
+def export_fields(result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [
+        field for field in result.get("fields") or []
+        if isinstance(field, dict) and field.get("key") and field["key"] != "raw_extraction"
+    ]
+
+
+def export_ndjson(results: Results) -> Iterator[bytes]:
+    """One JSON object per job with its fields as extracted."""
+    lines = []
+    for result in results():
+        lines.append(json.dumps({
+            **{column: result.get(column) for column in BASE_COLUMNS},
+            "fields": export_fields(result),
+        }, separators=(",", ":"), default=str))
+        if len(lines) >= settings.EXPORT_BATCH_ROWS:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def export_csv(results: Results) -> Iterator[bytes]:
+    """One row per job and one column per field key.
+
+    The header needs every key up front, so the results are read twice: once to
+    collect the keys and once to write the rows. Repeated keys within a job are
+    joined with "; ".
+    """
+    keys = sorted({field["key"] for result in results() for field in export_fields(result)})
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(BASE_COLUMNS + keys)
+
+    rows = 0
+    for result in results():
+        values: Dict[str, List[str]] = {}
+        for field in export_fields(result):
+            values.setdefault(field["key"], []).append(field_text(field.get("value")))
+        writer.writerow(
+            [field_text(result.get(column)) for column in BASE_COLUMNS]
+            + ["; ".join(values.get(key, [])) for key in keys]
+        )
+        rows += 1
+        if rows % settings.EXPORT_BATCH_ROWS == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def parquet_field(field: Dict[str, Any]) -> Dict[str, Any]:
+    location = field.get("location") if isinstance(field.get("location"), dict) else {}
+    page = location.get("page")
+    return {
+        "key": field["key"],
+        "value": field_text(field.get("value")),
+        "confidence": to_number(field.get("confidence")),
+        "field_type": field.get("field_type"),
+        "page": page if isinstance(page, int) else None,
+    }
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands the bytes written so far to the response."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def export_parquet(results: Results) -> Iterator[bytes]:
+    """Parquet with a row group per EXPORT_BATCH_ROWS jobs and fields as a list of structs."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    field_type = pa.struct([
+        ("key", pa.string()),
+        ("value", pa.string()),
+        ("confidence", pa.float64()),
+        ("field_type", pa.string()),
+        ("page", pa.int32()),
+    ])
+    schema = pa.schema([
+        ("job_id", pa.string()),
+        ("document_type", pa.string()),
+        ("created_at", pa.timestamp("us")),
+        ("fields", pa.list_(field_type)),
+    ])
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    rows = []
+    try:
+        for result in results():
+            rows.append({
+                "job_id": result.get("job_id"),
+                "document_type": result.get("document_type"),
+                "created_at": datetime.fromisoformat(result["created_at"]),
+                "fields": [parquet_field(field) for field in export_fields(result)],
+            })
+            if len(rows) >= settings.EXPORT_BATCH_ROWS:
+                writer.write_batch(pa.RecordBatch.from_pylist(rows, schema=schema))
+                rows = []
+                yield sink.drain()
+        if rows:
+            writer.write_batch(pa.RecordBatch.from_pylist(rows, schema=schema))
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+EXPORTERS = {
+    "ndjson": export_ndjson,
+    "csv": export_csv,
+    "parquet": export_parquet,
+}
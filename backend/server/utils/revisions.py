@@ -0,0 +1,50 @@
+import hashlib
+import re
+from typing import Any, Dict, List, Optional
+
+_SPACES = re.compile(r"\s+")
+
+
+def page_hash(page: str) -> str:
+    """Hash page text with whitespace collapsed so re-flowed output still matches."""
+    return hashlib.sha1(_SPACES.sub(" ", page or "").strip().encode("utf-8")).hexdigest()
+
+
+def match_unchanged_pages(previous_pages: List[str], pages: List[str]) -> Dict[int, int]:
+    """Map 1-indexed pages of the new version to identical pages of the previous one.
+
+    Pages are matched by content hash in order, so inserting or removing a page
+    still lets the pages after it be matched at their new positions.
+    """
+    previous_by_hash: Dict[str, List[int]] = {}
+    for number, page in enumerate(previous_pages, start=1):
+        if page and page.strip():
+            previous_by_hash.setdefault(page_hash(page), []).append(number)
+
+    unchanged = {}
+    for number, page in enumerate(pages, start=1):
+        candidates = previous_by_hash.get(page_hash(page)) if page and page.strip() else None
+        if candidates:
+            unchanged[number] = candidates.pop(0)
+    return unchanged
+
+
+def carry_over_fields(
+    fields: List[Dict[str, Any]], unchanged: Dict[int, int], previous_job_id: str
+) -> List[Dict[str, Any]]:
+    """Fields of the previous version located on unchanged pages, moved to their new page numbers."""
+    new_page_of = {previous: number for number, previous in unchanged.items()}
+    carried = []
+    for field in fields:
+        if not isinstance(field, dict) or not field.get("key") or field["key"] == "raw_extraction":
+            continue
+        location = field.get("location") if isinstance(field.get("location"), dict) else {}
+        new_page: Optional[int] = new_page_of.get(location.get("page"))
+        if new_page is None:
+            continue
+        carried.append(dict(
+            field,
+            location=dict(location, page=new_page),
+            carried_over_from=previous_job_id,
+        ))
+    return carried
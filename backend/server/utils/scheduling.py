@@ -0,0 +1,151 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from server.utils.config import settings
+
+
+def resolve_limits(meta: Optional[Dict[str, Any]]) -> Dict[str, float]:
+    """Merge a user's `meta["extraction_limits"]` over the configured defaults."""
+    limits = {
+        "rate_per_minute": settings.EXTRACTION_RATE_PER_MINUTE,
+        "burst": settings.EXTRACTION_BURST,
+        "weight": settings.EXTRACTION_DEFAULT_WEIGHT,
+        "daily_budget_usd": settings.USER_DAILY_BUDGET_USD or None,
+    }
+    overrides = (meta or {}).get("extraction_limits") or {}
+    for key in limits:
+        if isinstance(overrides.get(key), (int, float)) and overrides[key] > 0:
+            limits[key] = float(overrides[key])
+    return limits
+
+
+class TokenBucket:
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_consume(self, cost: float = 1.0) -> float:
+        """Take `cost` tokens; returns 0 on success or the seconds to wait otherwise."""
+        self._refill()
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+
+class UserRateLimiter:
+    """Per-user token buckets, re-sized whenever a user's limits change."""
+
+    def __init__(self):
+        self.buckets: Dict[Any, TokenBucket] = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, user_key: Any, limits: Dict[str, float], cost: float = 1.0) -> float:
+        rate = limits["rate_per_minute"] / 60.0
+        with self.lock:
+            bucket = self.buckets.get(user_key)
+            if bucket is None:
+                bucket = self.buckets[user_key] = TokenBucket(rate, limits["burst"])
+            elif bucket.rate != rate or bucket.capacity != limits["burst"]:
+                bucket._refill()
+                bucket.rate = rate
+                bucket.capacity = limits["burst"]
+                bucket.tokens = min(bucket.tokens, bucket.capacity)
+            return bucket.try_consume(cost)
+
+
+class FairShareScheduler:
+    """Weighted fair queueing of extraction jobs across users.
+
+    Uses start-time fair queueing: each job is tagged with
+    max(virtual time, owner's last finish tag) and advances the owner's finish
+    tag by cost / weight. The lowest start tag runs next whenever one of the
+    `max_concurrent` slots frees up, so a user with a deep backlog cannot starve
+    users who submit occasionally.
+    """
+
+    def __init__(self, max_concurrent: Optional[int] = None):
+        self.max_concurrent = max_concurrent or settings.EXTRACTION_MAX_CONCURRENT_JOBS
+        self.heap: List[Tuple[float, int, str]] = []
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.finish_tags: Dict[Any, float] = {}
+        self.virtual_time = 0.0
+        self.running = 0
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self._sequence = itertools.count()
+
+    def submit(
+        self,
+        job_id: str,
+        user_key: Any,
+        run: Callable[[], Awaitable[None]],
+        weight: float = 1.0,
+        cost: float = 1.0,
+    ):
+        start = max(self.virtual_time, self.finish_tags.get(user_key, 0.0))
+        self.finish_tags[user_key] = start + cost / max(weight, 1e-6)
+        self.entries[job_id] = {"user_key": user_key, "run": run, "start": start}
+        heapq.heappush(self.heap, (start, next(self._sequence), job_id))
+        self._dispatch()
+
+    def _dispatch(self):
+        while self.running < self.max_concurrent and self.heap:
+            start, _, job_id = heapq.heappop(self.heap)
+            entry = self.entries.pop(job_id, None)
+            if entry is None:
+                continue
+            self.virtual_time = max(self.virtual_time, start)
+            self.running += 1
+            self.tasks[job_id] = asyncio.create_task(self._run(job_id, entry["run"]))
+
+    async def _run(self, job_id: str, run: Callable[[], Awaitable[None]]):
+        try:
+            await run()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self.tasks.pop(job_id, None)
+            self.running -= 1
+            self._dispatch()
+
+    def remove(self, job_id: str) -> bool:
+        """Drop a queued job; its heap slot is skipped lazily on dispatch."""
+        return self.entries.pop(job_id, None) is not None
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel the task of a running job, closing any request it awaits."""
+        task = self.tasks.get(job_id)
+        if task is None or task.done():
+            return False
+        task.cancel()
+        return True
+
+    def queue_position(self, job_id: str) -> Optional[int]:
+        entry = self.entries.get(job_id)
+        if entry is None:
+            return None
+        return sum(1 for other in self.entries.values() if other["start"] < entry["start"])
+
+    def stats(self) -> Dict[str, Any]:
+        queued_per_user: Dict[str, int] = {}
+        for entry in self.entries.values():
+            key = str(entry["user_key"])
+            queued_per_user[key] = queued_per_user.get(key, 0) + 1
+        return {
+            "max_concurrent": self.max_concurrent,
+            "running": self.running,
+            "queued": len(self.entries),
+            "queued_per_user": queued_per_user,
+            "virtual_time": self.virtual_time,
+        }
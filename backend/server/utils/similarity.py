@@ -0,0 +1,169 @@
+import hashlib
+import re
+import threading
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+from server.utils.config import settings
+
+NUM_PERM = 128
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERM // LSH_BANDS
+SHINGLE_SIZE = 5
+
+_EMPTY = (1 << 64) - 1
+_DIGITS = re.compile(r"\d+")
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def text_fingerprint(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _shingle_hashes(text: str) -> Set[int]:
+    """Hash word 5-shingles; digit runs collapse so templates with new numbers match."""
+    tokens = _WORD.findall(_DIGITS.sub("0", text.lower()))
+    if not tokens:
+        return set()
+    size = min(SHINGLE_SIZE, len(tokens))
+    return {
+        int.from_bytes(
+            hashlib.blake2b(" ".join(tokens[i:i + size]).encode("utf-8"), digest_size=8).digest(),
+            "big",
+        )
+        for i in range(len(tokens) - size + 1)
+    }
+
+
+def minhash_signature(text: str) -> Optional[Tuple[int, ...]]:
+    """One-permutation MinHash with rotation densification.
+
+    Each shingle is hashed once and binned, which keeps signing linear in the
+    number of shingles instead of NUM_PERM times that.
+    """
+    hashes = _shingle_hashes(text)
+    if not hashes:
+        return None
+
+    bins = [_EMPTY] * NUM_PERM
+    for value in hashes:
+        index = value % NUM_PERM
+        value //= NUM_PERM
+        if value < bins[index]:
+            bins[index] = value
+
+    signature = list(bins)
+    for index in range(NUM_PERM):
+        if bins[index] != _EMPTY:
+            continue
+        for distance in range(1, NUM_PERM):
+            donor = bins[(index + distance) % NUM_PERM]
+            if donor != _EMPTY:
+                signature[index] = donor + distance * (_EMPTY // (NUM_PERM * NUM_PERM))
+                break
+    return tuple(signature)
+
+
+def estimate_similarity(a: Tuple[int, ...], b: Tuple[int, ...]) -> float:
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_PERM
+
+
+class NearDuplicateIndex:
+    """MinHash/LSH index over the page text of completed jobs.
+
+    Signatures are split into LSH_BANDS bands of LSH_ROWS rows; a document only
+    needs to share one band with a prior job to become a candidate, and candidates
+    are then verified against the estimated Jaccard similarity threshold.
+    """
+
+    def __init__(self, threshold: Optional[float] = None):
+        self.threshold = threshold if threshold is not None else settings.NEAR_DUPLICATE_THRESHOLD
+        self.buckets: Dict[Tuple[int, int], Set[str]] = {}
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+        self.queries = 0
+        self.matched_queries = 0
+        self.exact_matches = 0
+        self.candidates_checked = 0
+        self.reused = {"exact": 0, "document_type": 0, "seeded": 0}
+
+    def _bands(self, signature: Tuple[int, ...]):
+        for band in range(LSH_BANDS):
+            yield band, hash(signature[band * LSH_ROWS:(band + 1) * LSH_ROWS])
+
+    def add(self, job_id: str, signature: Tuple[int, ...], fingerprint: str, document_type: Optional[str]):
+        with self.lock:
+            if job_id in self.entries:
+                self._remove(job_id)
+            self.entries[job_id] = {
+                "signature": signature,
+                "fingerprint": fingerprint,
+                "document_type": document_type,
+            }
+            for key in self._bands(signature):
+                self.buckets.setdefault(key, set()).add(job_id)
+
+    def remove(self, job_id: str):
+        with self.lock:
+            self._remove(job_id)
+
+    def _remove(self, job_id: str):
+        entry = self.entries.pop(job_id, None)
+        if entry is None:
+            return
+        for key in self._bands(entry["signature"]):
+            bucket = self.buckets.get(key)
+            if bucket is not None:
+                bucket.discard(job_id)
+                if not bucket:
+                    del self.buckets[key]
+
+    def query(
+        self, signature: Tuple[int, ...], fingerprint: str, limit: int = 5
+    ) -> List[Dict[str, Any]]:
+        """Return prior jobs at or above the threshold, most similar first."""
+        with self.lock:
+            candidates: Set[str] = set()
+            for key in self._bands(signature):
+                candidates.update(self.buckets.get(key, ()))
+
+            matches = []
+            for job_id in candidates:
+                entry = self.entries[job_id]
+                exact = entry["fingerprint"] == fingerprint
+                similarity = 1.0 if exact else estimate_similarity(signature, entry["signature"])
+                if similarity >= self.threshold:
+                    matches.append({
+                        "job_id": job_id,
+                        "similarity": round(similarity, 3),
+                        "exact": exact,
+                        "document_type": entry["document_type"],
+                    })
+
+            self.queries += 1
+            self.candidates_checked += len(candidates)
+            if matches:
+                self.matched_queries += 1
+            if any(match["exact"] for match in matches):
+                self.exact_matches += 1
+
+        matches.sort(key=lambda match: (match["exact"], match["similarity"]), reverse=True)
+        return matches[:limit]
+
+    def record_reuse(self, kind: str):
+        with self.lock:
+            self.reused[kind] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "threshold": self.threshold,
+                "indexed_documents": len(self.entries),
+                "queries": self.queries,
+                "matched_queries": self.matched_queries,
+                "hit_rate": self.matched_queries / self.queries if self.queries else 0.0,
+                "exact_matches": self.exact_matches,
+                "avg_candidates_per_query": (
+                    self.candidates_checked / self.queries if self.queries else 0.0
+                ),
+                "reused": dict(self.reused),
+            }
@@ -0,0 +1,107 @@
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from server import crud
+from server.utils.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# USD per million (input, output) tokens
+MODEL_PRICES = {
+    "claude-3-5-sonnet-20241022": (3.0, 15.0),
+    "claude-3-opus-20240229": (15.0, 75.0),
+    "claude-3-sonnet-20240229": (3.0, 15.0),
+    "claude-3-haiku-20240307": (0.25, 1.25),
+}
+
+# Message-batch requests are billed at half the regular price
+BATCH_PRICE_FACTOR = 0.5
+
+
+def estimate_cost(model: Optional[str], usage, price_factor: float = 1.0) -> float:
+    if usage is None:
+        return 0.0
+    input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    input_tokens = getattr(usage, "input_tokens", 0) or 0
+    output_tokens = getattr(usage, "output_tokens", 0) or 0
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000 * price_factor
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+class UsageTracker:
+    """Records the token usage of every model call and tracks daily spend per user.
+
+    Rows are written to the model_usage table on `executor` so accounting never
+    blocks extraction. Budget checks read today's spend from the table, so every
+    worker process enforces the same total, plus this process's costs whose rows
+    are still queued.
+    """
+
+    def __init__(self, executor):
+        self.executor = executor
+        self.unwritten: Dict[Any, float] = {}
+        self.lock = threading.Lock()
+
+    def record(
+        self,
+        job: Optional[Dict[str, Any]],
+        model: Optional[str],
+        purpose: str,
+        usage,
+        latency_seconds: Optional[float] = None,
+        price_factor: float = 1.0,
+    ) -> float:
+        job = job or {}
+        cost = estimate_cost(model, usage, price_factor)
+        user_id = job.get("user_id")
+        with self.lock:
+            self.unwritten[user_id] = self.unwritten.get(user_id, 0.0) + cost
+
+        self.executor.submit(self._write, {
+            "job_id": job.get("job_id"),
+            "user_id": user_id,
+            "document_type": job.get("document_type"),
+            "model": model or "unknown",
+            "purpose": purpose,
+            "input_tokens": getattr(usage, "input_tokens", None) or 0,
+            "output_tokens": getattr(usage, "output_tokens", None) or 0,
+            "cost_usd": cost,
+            "latency_ms": int(latency_seconds * 1000) if latency_seconds is not None else None,
+        })
+        return cost
+
+    def _write(self, row: Dict[str, Any]):
+        db = SessionLocal()
+        try:
+            crud.model_usage.record(db, **row)
+        except Exception as e:
+            logger.error(f"Failed to record model usage for job {row['job_id']}: {e}")
+        finally:
+            db.close()
+            with self.lock:
+                self.unwritten[row["user_id"]] -= row["cost_usd"]
+
+    def spent_today(self, user_id: Any, db: Optional[Session] = None) -> float:
+        """Today's spend across all workers, queried through `db` (or a new session)."""
+        since = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+        if db is not None:
+            spent = crud.model_usage.spent_since(db, user_id, since)
+        else:
+            db = SessionLocal()
+            try:
+                spent = crud.model_usage.spent_since(db, user_id, since)
+            finally:
+                db.close()
+
+        with self.lock:
+            return spent + self.unwritten.get(user_id, 0.0)
+
+    def over_budget(self, user_id: Any, budget_usd: Optional[float], db: Optional[Session] = None) -> bool:
+        return bool(budget_usd) and self.spent_today(user_id, db) >= budget_usd
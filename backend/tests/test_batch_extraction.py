@@ -0,0 +1,152 @@
+import asyncio
+import json
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from server.schemas.extraction import JobStatus
+from server.utils.batch_extraction import LocalMessageBatches
+from server.utils.config import settings
+from server.utils.extraction_service import ExtractionService
+
+PAGE_TEXT = "Annual report. Total revenue for the year was 1,500,000 across all regions."
+
+
+def make_pdf(text: str) -> bytes:
+    """A one-page PDF with a text layer."""
+    content = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R "
+        "/Resources << /Font << /F1 5 0 R >> >> >>",
+        f"<< /Length {len(content)} >>\nstream\n{content}\nendstream",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    pdf = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += f"{number} 0 obj\n{body}\nendobj\n".encode()
+    xref = len(pdf)
+    pdf += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    pdf += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    pdf += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF".encode()
+    return pdf
+
+
+class FakeMessages:
+    """Answers classification and extraction prompts like the model would.
+
+    With `hold_first`, the first call blocks until `release` is set.
+    """
+
+    def __init__(self, hold_first: bool = False):
+        self.max_tokens = []
+        self.models = []
+        self.held = threading.Event()
+        self.release = threading.Event()
+        if not hold_first:
+            self.release.set()
+
+    def create(self, model, max_tokens, messages, **kwargs):
+        if not self.held.is_set():
+            self.held.set()
+            self.release.wait(timeout=10)
+        self.max_tokens.append(max_tokens)
+        self.models.append(model)
+        if max_tokens == 10:
+            text = "financial"
+        else:
+            text = json.dumps({
+                "document_type": "financial",
+                "fields": [{
+                    "key": "revenue",
+                    "value": 1500000,
+                    "source_text": "1,500,000",
+                    "confidence": 0.95,
+                    "field_type": "currency",
+                    "label": "Revenue",
+                    "location": {"page": 1, "region": "top"},
+                }],
+            })
+        return SimpleNamespace(
+            model=model,
+            content=[SimpleNamespace(text=text)],
+            usage=SimpleNamespace(input_tokens=100, output_tokens=20),
+        )
+
+
+class BulkExtractionTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        patcher = mock.patch.object(settings, "BULK_COLLECT_WINDOW_SECONDS", 0.01)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.service = ExtractionService()
+        self.use_messages(FakeMessages())
+
+    def use_messages(self, messages: FakeMessages):
+        self.messages = messages
+        self.service.bulk_runner._batches = LocalMessageBatches(messages)
+
+    async def wait_finished(self, job_id: str, timeout: float = 5.0):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while self.service.jobs[job_id]["status"] in (JobStatus.PENDING, JobStatus.PROCESSING):
+            self.assertLess(loop.time(), deadline, f"Job {job_id} did not finish")
+            await asyncio.sleep(0.01)
+        return self.service.jobs[job_id]
+
+    async def test_bulk_job_runs_end_to_end(self):
+        job_ids = [
+            self.service.create_job(make_pdf(PAGE_TEXT), "auto", bulk=True),
+            self.service.create_job(make_pdf(PAGE_TEXT), "financial", bulk=True),
+        ]
+
+        for job_id in job_ids:
+            job = await self.wait_finished(job_id)
+            self.assertEqual(job["status"], JobStatus.COMPLETED)
+            self.assertEqual(job["document_type"], "financial")
+            result = self.service.retention.load_result(job_id)
+            self.assertEqual([field["key"] for field in result["fields"]], ["revenue"])
+        # One classification for the auto job and one extraction per job
+        self.assertEqual(sorted(self.messages.max_tokens), [10, 4096, 4096])
+
+    async def test_jobs_do_not_wait_for_batches_in_flight(self):
+        self.use_messages(FakeMessages(hold_first=True))
+        first = self.service.create_job(make_pdf(PAGE_TEXT), "financial", bulk=True)
+        while not self.messages.held.is_set():
+            await asyncio.sleep(0.01)
+
+        second = self.service.create_job(make_pdf(PAGE_TEXT), "financial", bulk=True)
+        self.assertEqual((await self.wait_finished(second))["status"], JobStatus.COMPLETED)
+        self.assertEqual(self.service.jobs[first]["status"], JobStatus.PROCESSING)
+
+        self.messages.release.set()
+        self.assertEqual((await self.wait_finished(first))["status"], JobStatus.COMPLETED)
+
+    async def test_bulk_jobs_respect_the_daily_budget(self):
+        spent = mock.patch.object(self.service.usage, "spent_today", return_value=5.0)
+        spent.start()
+        self.addCleanup(spent.stop)
+
+        with mock.patch.object(settings, "USAGE_BUDGET_ACTION", "reject"):
+            job_id = self.service.create_job(
+                make_pdf(PAGE_TEXT), "financial", bulk=True, daily_budget_usd=1.0
+            )
+            job = await self.wait_finished(job_id)
+        self.assertEqual(job["status"], JobStatus.FAILED)
+        self.assertEqual(self.messages.models, [])
+
+        with mock.patch.object(settings, "USAGE_BUDGET_ACTION", "downgrade"):
+            job_id = self.service.create_job(
+                make_pdf(PAGE_TEXT), "auto", bulk=True, daily_budget_usd=1.0
+            )
+            job = await self.wait_finished(job_id)
+        self.assertEqual(job["status"], JobStatus.COMPLETED)
+        self.assertEqual(self.messages.models, [settings.USAGE_DOWNGRADE_MODEL] * 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -11,6 +11,7 @@ import {
   SelectValue,
 } from "@/components/ui/select";
 import { toast } from "sonner";
+import { extractionAPI } from "@/lib/api";
 
 interface PDFUploadProps {
   onUploadSuccess: (jobId: string) => void;
@@ -60,23 +61,7 @@ export function PDFUpload({ onUploadSuccess }: PDFUploadProps) {
 
     setIsUploading(true);
     try {
-      const formData = new FormData();
-      formData.append("file", selectedFile);
-      formData.append("document_type", documentType);
-
-      const response = await fetch(
-        `${process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000"}/extraction/upload`,
-        {
-          method: "POST",
-          body: formData,
-        }
-      );
-
-      if (!response.ok) {
-        throw new Error("Upload failed");
-      }
-
-      const data = await response.json();
+      const data = await extractionAPI.uploadPDF(selectedFile, documentType);
       toast.success("PDF uploaded successfully!");
       onUploadSuccess(data.job_id);
       setSelectedFile(null);
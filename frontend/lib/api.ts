@@ -1,6 +1,4 @@
-import axios from 'axios';
-
-const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
+import authRequest from './authRequest';
 
 export interface UploadResponse {
   job_id: string;
@@ -47,7 +45,7 @@ export const extractionAPI = {
     formData.append('file', file);
     formData.append('document_type', documentType);
 
-    const response = await axios.post(`${API_BASE_URL}/extraction/upload`, formData, {
+    const response = await authRequest.post('/extraction/upload', formData, {
       headers: {
         'Content-Type': 'multipart/form-data',
       },
@@ -57,17 +55,17 @@ export const extractionAPI = {
   },
 
   getJobStatus: async (jobId: string): Promise<JobStatusResponse> => {
-    const response = await axios.get(`${API_BASE_URL}/extraction/status/${jobId}`);
+    const response = await authRequest.get(`/extraction/status/${jobId}`);
     return response.data;
   },
 
   getResult: async (jobId: string): Promise<ExtractionResult> => {
-    const response = await axios.get(`${API_BASE_URL}/extraction/result/${jobId}`);
+    const response = await authRequest.get(`/extraction/result/${jobId}`);
     return response.data;
   },
 
   getHistory: async (): Promise<ExtractionResult[]> => {
-    const response = await axios.get(`${API_BASE_URL}/extraction/history`);
+    const response = await authRequest.get('/extraction/history');
     return response.data.history;
   },
 };